@@ -1,14 +1,36 @@
+import json
 import os
+import time
 import pandas as pd
-from flask import Flask, request, render_template, redirect, url_for, jsonify 
+from flask import Flask, Response, g, request, render_template, redirect, url_for, jsonify 
 from werkzeug.utils import secure_filename
 from flask_cors import CORS # Import CORS
-import joblib
-from utils.preprocess import preprocess_uploaded_dataframe
+from utils.preprocess import OrderPreprocessor, coerce_upload, preprocess_csv_in_chunks, read_upload
+from utils.models import MODEL_PATHS, ModelRegistry
+from utils.batching import MicroBatcher
+from utils.cache import PredictionCache
+from utils.dashboard import (
+    SUMMARY_COLUMNS, CubeStore, RiskCube, build_summary, load_summary, risk_per_row, save_summary
+)
+from utils.incremental import refresh_scores
+from utils.metrics import metrics, peak_rss_bytes, server_timing
+from utils.inference import CompiledPipeline, same_preprocessing, score_features, score_sparse
+from utils.storage import (
+    ARROW_FILE, ARROW_STREAM, arrow_bytes, downcast, find_frame, frame_columns, frame_path, iter_csv, read_arrow,
+    read_frame, write_frame
+)
 import numpy as np
 
 from optimization.tabu import tabu_search
 from optimization.ga import genetic
+from optimization.islands import island_genetic
+from optimization.multistart import multi_start_tabu
+from optimization.shared import pool_workers
+from optimization.solver import METHODS, solve
+from optimization.jobs import JobManager, OptimizationJob
+from optimization.orders import (
+    CLASSIFICATION_DIR, REGRESSION_DIR, SCORES_DIR, OrderStore, load_predictions, prediction_paths
+)
 
 
 app = Flask(__name__)
@@ -20,17 +42,188 @@ UPLOAD_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), 'uploads
 ALLOWED_EXTENSIONS = {'csv'}
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-
-CLASSIFICATION_MODEL_PATH = './backend/model/delay_prediction_pipeline.joblib'
-
-try:
-    model = joblib.load(CLASSIFICATION_MODEL_PATH)
-except Exception as e:
-    model = None
-    print(f"Failed to load model: {e}")
+# Rows per chunk when streaming uploads through preprocessing; 0 reads the whole file at once
+app.config['UPLOAD_CHUNK_ROWS'] = int(os.environ.get('UPLOAD_CHUNK_ROWS', 50_000))
+# Most rows /score_batch scores in one model call when coalescing concurrent requests
+app.config['SCORE_BATCH_ROWS'] = int(os.environ.get('SCORE_BATCH_ROWS', 8192))
+# How long the first queued scoring request waits for others to share its model call
+app.config['SCORE_BATCH_MAX_WAIT_MS'] = float(os.environ.get('SCORE_BATCH_MAX_WAIT_MS', 5))
+# Score through CompiledPipeline (folded preprocessing + Booster.inplace_predict); 0 uses the sklearn pipelines
+app.config['COMPILED_INFERENCE'] = os.environ.get('COMPILED_INFERENCE', '1') != '0'
+# XGBoost threads for compiled inference; 0 keeps the booster's default
+app.config['INFERENCE_THREADS'] = int(os.environ.get('INFERENCE_THREADS', 0))
+
+# Models are loaded once and hot-reloaded when their files change
+model_registry = ModelRegistry(MODEL_PATHS)
+model_registry.load_all()
 # Ensure the upload folder exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Prediction arrays per processed-file content and model version
+prediction_cache = PredictionCache()
+
+# Parsed order tables per upload, reused across optimization calls
+order_store = OrderStore()
+
+# Risk histograms per dashboard dimension, rebuilt once per prediction run
+dashboard_cubes = CubeStore()
+
+# In-memory scoring requests, coalesced into shared model calls
+def score_orders(df):
+    """
+    Risk and predicted shipping days of raw order rows, without touching
+    disk. Upload dtypes are applied here, once per combined batch, rather
+    than per request.
+    """
+    classifier = inference_model('classification')
+    regressor = inference_model('regression')
+    features = order_preprocessor().transform(coerce_upload(df))
+    risk, days, _ = score_features(features, classifier, regressor)
+    return risk, days
+
+score_batcher = MicroBatcher(score_orders, max_rows=app.config['SCORE_BATCH_ROWS'],
+                             max_wait=app.config['SCORE_BATCH_MAX_WAIT_MS'] / 1000)
+
+# Background optimizer runs for "async": true requests
+optimization_jobs = JobManager(max_workers=int(os.environ.get('OPTIMIZE_JOB_WORKERS', 2)))
+
+@app.before_request
+def start_request_timing():
+    g.metrics_token, g.stage_timings = metrics.begin_request()
+    g.peak_rss = peak_rss_bytes()
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def add_server_timing(response):
+    # 每個請求回傳各階段耗時，並記錄整個請求的延遲
+    if 'request_started' in g:
+        total = time.perf_counter() - g.request_started
+        timings = [*g.stage_timings, ('total', total)]
+        metrics.end_request(g.metrics_token)
+        metrics.observe(f"request_{request.endpoint or 'unknown'}", total,
+                        peak_before=g.peak_rss, peak_after=peak_rss_bytes())
+        response.headers['Server-Timing'] = server_timing(timings)
+    return response
+
+# CompiledPipeline per (model name, version)
+compiled_models = {}
+
+def inference_model(name):
+    """
+    The model used for scoring: the registry's pipeline compiled into a
+    CompiledPipeline, or the pipeline itself when compiling is disabled or
+    the pipeline has another shape.
+    """
+    model = model_registry.get(name)
+    if not app.config['COMPILED_INFERENCE']:
+        return model
+    key = (name, model_registry.version(name))
+    compiled = compiled_models.get(key)
+    if compiled is None:
+        try:
+            compiled = CompiledPipeline(model, n_threads=app.config['INFERENCE_THREADS'])
+        except ValueError as e:
+            print(f"Model '{name}' not compiled: {e}")
+            compiled = model
+        # 同一模型只保留目前版本
+        for old in [old for old in compiled_models if old[0] == name]:
+            del compiled_models[old]
+        compiled_models[key] = compiled
+    return compiled
+
+# OrderPreprocessor per (encoder, classifier) version; it is only read after construction
+order_preprocessors = {}
+
+def order_preprocessor():
+    """Preprocessor for the loaded encoder, with the classifier's training feature schema."""
+    encoder = model_registry.get('encoder')
+    classifier = model_registry.get('classification')
+    key = (model_registry.version('encoder'), model_registry.version('classification'))
+    preprocessor = order_preprocessors.get(key)
+    if preprocessor is None:
+        # 模型更新後舊的前處理器不再使用
+        order_preprocessors.clear()
+        preprocessor = order_preprocessors[key] = OrderPreprocessor(encoder, classifier.feature_names_in_)
+    return preprocessor
+
+def dashboard_sources(file_name):
+    """Files and model version the dashboard aggregates of an upload depend on."""
+    sources = [os.path.join(UPLOAD_FOLDER, f'{file_name}.csv'),
+               *prediction_paths(file_name, kinds=('risk',)).values()]
+    return sources, model_registry.version('classification')
+
+def dashboard_cube(file_name, refresh=False):
+    """RiskCube of an upload, rebuilt from the raw rows and risk predictions when stale."""
+    sources, version = dashboard_sources(file_name)
+
+    def build():
+        data_path = sources[0]
+        # 只讀取儀表板需要的欄位
+        header = frame_columns(data_path)
+        raw = read_upload(data_path, usecols=[column for column in SUMMARY_COLUMNS if column in header])
+        predictions = load_predictions(file_name, kinds=('risk',))['risk']
+        with metrics.stage('aggregate', rows=len(raw)):
+            return RiskCube.build(raw, risk_per_row(raw, predictions))
+
+    return dashboard_cubes.get(file_name, sources, version, build, refresh=refresh)
+
+def dashboard_summary(file_name, refresh=False):
+    """
+    Dashboard aggregates of an upload. The stored summary is returned while
+    the raw upload, its risk predictions and the classifier are unchanged;
+    otherwise (or with refresh) it is rebuilt from the risk cube and stored
+    again.
+    """
+    sources, version = dashboard_sources(file_name)
+    summary = None if refresh else load_summary(file_name, sources, version)
+    if summary is None:
+        model = model_registry.get('classification')
+        summary = build_summary(dashboard_cube(file_name, refresh), model.named_steps['xgb'].feature_importances_,
+                                model.feature_names_in_)
+        save_summary(file_name, summary, sources, version)
+    return summary
+
+def refresh_dashboard_summary(file_name):
+    """Rebuilds the stored summary after new predictions; skipped when the raw upload is gone."""
+    if not os.path.isfile(os.path.join(UPLOAD_FOLDER, f'{file_name}.csv')):
+        return
+    try:
+        dashboard_summary(file_name, refresh=True)
+    except Exception as e:
+        # 儀表板摘要失敗不影響預測結果，請求時會再重建
+        print(f"Dashboard summary for '{file_name}' not refreshed: {e}")
+
+def current_scores_path(file_name):
+    """
+    The fused scores artifact of an upload when it is at least as new as
+    the processed features, or None. /upload?incremental=1 refreshes only
+    this artifact, so the processed frame is then stale and /prediction and
+    /regression serve the artifact's scores instead of re-scoring it.
+    """
+    scores_path = find_frame(SCORES_DIR, f"{file_name}_scores")
+    processed_path = find_frame(UPLOAD_FOLDER, f"{file_name}_processed")
+    if scores_path is None or (processed_path is not None
+                               and os.path.getmtime(processed_path) > os.path.getmtime(scores_path)):
+        return None
+    return scores_path
+
+def fresh_prediction_path(directory, file_name, source_path):
+    """
+    The stored <file_name>_prediction artifact when it is at least as new
+    as ``source_path``, the features or scores it was predicted from, or
+    None. Cache hits leave a fresh artifact, and the dashboard summary
+    built from it, untouched.
+    """
+    path = find_frame(directory, f"{file_name}_prediction")
+    if path is None or os.path.getmtime(path) < os.path.getmtime(source_path):
+        return None
+    return path
+
+def stored_scores(scores_path, column):
+    """('Order Id' frame, predictions, True) from a fused scores artifact's 'risk' or 'days'."""
+    df = read_frame(scores_path, columns=['Order Id', column])
+    return df[['Order Id']], df[column].to_numpy(), True
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -54,21 +247,35 @@ def upload_file():
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        name, ext = os.path.splitext(filename)
-        processed_filename = f"{name}_processed{ext}"
-        filepath_processed = os.path.join(app.config['UPLOAD_FOLDER'], processed_filename)
+        name, _ = os.path.splitext(filename)
+        filepath_processed = frame_path(app.config['UPLOAD_FOLDER'], f"{name}_processed")
+
+        columns_to_return = ['Shipping Mode', 'order date (DateOrders)', 'Customer City', 'Customer Country', 'Latitude', 'Longitude']
+        chunksize = request.values.get('chunksize', app.config['UPLOAD_CHUNK_ROWS'], type=int)
+        incremental = request.values.get('incremental', '').lower() in ('1', 'true')
 
         try:
-            file.save(filepath)
-
-            # 讀取上傳的 CSV 檔案
-            df = pd.read_csv(filepath)
-            # 擷取指定欄位資料
-            columns_to_return = ['Shipping Mode', 'order date (DateOrders)', 'Customer City', 'Customer Country', 'Latitude', 'Longitude']
-            selected_df = df[columns_to_return]
-            # 前處理資料
-            preprocessed_df = preprocess_uploaded_dataframe(df, encoder_path='./backend/model/one_hot_encoder.joblib')
-            preprocessed_df.to_csv(filepath_processed, index=False)
+            with metrics.stage('upload_save'):
+                file.save(filepath)
+            preprocessor = order_preprocessor()
+
+            if incremental:
+                # 只重新預測新增或變動的列，並更新合併後的預測結果
+                raw, _, stats, _ = score_incrementally(name)
+                selected_df = raw[columns_to_return].head(chunksize) if chunksize and chunksize > 0 else raw[columns_to_return]
+                print(f"Incremental refresh of '{filename}': {stats}")
+            elif chunksize and chunksize > 0:
+                # 分批讀取、前處理並寫出，記憶體用量只與批次大小有關；預覽取第一批
+                selected_df, _ = preprocess_csv_in_chunks(filepath, filepath_processed, preprocessor,
+                                                          chunksize=chunksize, preview_columns=columns_to_return)
+            else:
+                # 讀取上傳的 CSV 檔案
+                df = read_upload(filepath)
+                # 擷取指定欄位資料
+                selected_df = df[columns_to_return]
+                # 前處理資料
+                preprocessed_df = preprocessor.transform(df)
+                write_frame(downcast(preprocessed_df), filepath_processed)
             print(f"File '{filename}' uploaded and preprocessed successfully.")
 
             # 回傳 JSON 給前端
@@ -80,6 +287,10 @@ def upload_file():
         except pd.errors.ParserError as e:
             print("parser")
             return f"Error parsing CSV file: {e}", 400
+        except ValueError as e:
+            # 欄位缺漏或型別不符（例如整數欄位有空值）
+            print(e)
+            return f"Invalid CSV data: {e}", 400
         except Exception as e:
             print(e)
             return f"An error occurred during file processing: {e}", 500
@@ -90,8 +301,6 @@ def upload_file():
 
 @app.route('/prediction', methods=['POST'])
 def prediction():
-    from joblib import load
-
     # Get filename from JSON body or query param
     data = request.get_json() or request.args
     file_name = data.get('file_name')
@@ -99,41 +308,53 @@ def prediction():
     if not file_name:
         return jsonify({'error': 'Missing file_name parameter'}), 400
 
-    file_path = os.path.join('./backend/uploads', f"{file_name}_processed.csv")
+    file_name = secure_filename(file_name)
+    file_path = find_frame(UPLOAD_FOLDER, f"{file_name}_processed")
+    scores_path = current_scores_path(file_name)
 
-    if not os.path.isfile(file_path):
-        return jsonify({'error': f"File not found: {file_path}"}), 404
+    if file_path is None and scores_path is None:
+        return jsonify({'error': f"File not found: {frame_path(UPLOAD_FOLDER, f'{file_name}_processed')}"}), 404
 
-    # Load model (if not already loaded globally)
     try:
-        model = load('./backend/model/delay_prediction_pipeline.joblib')
+        model = inference_model('classification')
     except Exception as e:
         return jsonify({'error': f'Model could not be loaded: {e}'}), 500
 
     try:
-        # Load the processed CSV
-        df = pd.read_csv(file_path)
-
-        # Make predictions
-        predictions = model.predict_proba(df)
-
-        predictions = predictions[:, 1]
-        # Add prediction results to a new column
-        result_df = df.copy()
-        result_df['PredictedValue'] = predictions
-
-        # Keep only 'Order Id' and 'PredictedValue' columns
-        result_df = result_df[['Order Id', 'PredictedValue']]
-
-        # Save to ./backend/Classification_prediction/<file_name>_prediction.csv
-        output_dir = './backend/Classification_prediction'
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, f"{file_name}_prediction.csv")
-        result_df.to_csv(output_path, index=False)
+        if scores_path is not None:
+            df, predictions, cached = stored_scores(scores_path, 'risk')
+        else:
+            key = prediction_cache.key('classification', [file_path], model_registry.version('classification'))
+            predictions = prediction_cache.get(key)
+            cached = predictions is not None
+            df = None
+            if not cached:
+                # Load the processed features
+                df = read_frame(file_path)
+
+                # Make predictions
+                with metrics.stage('predict', rows=len(df)):
+                    predictions = model.predict_proba(df)[:, 1]
+                prediction_cache.put(key, predictions)
+
+        output_path = fresh_prediction_path(CLASSIFICATION_DIR, file_name, scores_path or file_path) if cached else None
+        if output_path is None:
+            if df is None:
+                # 快取命中時只需讀取 'Order Id'
+                df = read_frame(file_path, columns=['Order Id'])
+
+            # Keep only 'Order Id' and 'PredictedValue' columns
+            result_df = df[['Order Id']].assign(PredictedValue=predictions)
+
+            # Save to backend/Classification_prediction/<file_name>_prediction.parquet
+            os.makedirs(CLASSIFICATION_DIR, exist_ok=True)
+            output_path = write_frame(downcast(result_df), frame_path(CLASSIFICATION_DIR, f"{file_name}_prediction"))
+            refresh_dashboard_summary(file_name)
 
         return jsonify({
             'predictions': predictions.tolist(),
-            'saved_to': output_path
+            'saved_to': output_path,
+            'cached': cached
         })
 
     except Exception as e:
@@ -141,8 +362,6 @@ def prediction():
 
 @app.route('/regression', methods=['POST'])
 def regression_prediction():
-    from joblib import load
-
     # Get filename from JSON body or query param
     data = request.get_json() or request.args
     file_name = data.get('file_name')
@@ -150,160 +369,557 @@ def regression_prediction():
     if not file_name:
         return jsonify({'error': 'Missing file_name parameter'}), 400
 
-    file_path = os.path.join('./backend/uploads', f"{file_name}_processed.csv")
+    file_name = secure_filename(file_name)
+    file_path = find_frame(UPLOAD_FOLDER, f"{file_name}_processed")
+    scores_path = current_scores_path(file_name)
 
-    if not os.path.isfile(file_path):
-        return jsonify({'error': f"File not found: {file_path}"}), 404
+    if file_path is None and scores_path is None:
+        return jsonify({'error': f"File not found: {frame_path(UPLOAD_FOLDER, f'{file_name}_processed')}"}), 404
 
     # Load regression model
     try:
-        model = load('./backend/model/shipping_real_regression_pipeline.joblib')
+        model = inference_model('regression')
     except Exception as e:
         return jsonify({'error': f'Model could not be loaded: {e}'}), 500
 
     try:
-        # Load processed data
-        df = pd.read_csv(file_path)
-        # Perform regression prediction
-        predictions = model.predict(df)
+        if scores_path is not None:
+            df, predictions, cached = stored_scores(scores_path, 'days')
+        else:
+            key = prediction_cache.key('regression', [file_path], model_registry.version('regression'))
+            predictions = prediction_cache.get(key)
+            cached = predictions is not None
+            df = None
+            if not cached:
+                # Load processed data
+                df = read_frame(file_path)
+                # Perform regression prediction
+                with metrics.stage('predict', rows=len(df)):
+                    predictions = model.predict(df)
+                prediction_cache.put(key, predictions)
+
+        output_path = fresh_prediction_path(REGRESSION_DIR, file_name, scores_path or file_path) if cached else None
+        if output_path is None:
+            if df is None:
+                df = read_frame(file_path, columns=['Order Id'])
+
+            # Keep only 'Order Id' and 'PredictedValue' columns
+            result_df = df[['Order Id']].assign(PredictedValue=predictions)
+
+            # Save result to Regression_prediction directory
+            os.makedirs(REGRESSION_DIR, exist_ok=True)
+            output_path = write_frame(downcast(result_df), frame_path(REGRESSION_DIR, f"{file_name}_prediction"))
+
+        return jsonify({
+            'predictions': predictions.tolist(),
+            'saved_to': output_path,
+            'cached': cached
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        # Add prediction results to a new column
-        result_df = df.copy()
-        result_df['PredictedValue'] = predictions
 
-        # Keep only 'Order Id' and 'PredictedValue' columns
-        result_df = result_df[['Order Id', 'PredictedValue']]
 
-        # Save result to Regression_prediction directory
-        output_dir = './backend/Regression_prediction'
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, f"{file_name}_prediction.csv")
-        result_df.to_csv(output_path, index=False)
+def score_incrementally(file_name):
+    """
+    Scores the raw upload <file_name>.csv into the fused scores artifact,
+    re-using the stored risk and days of rows whose content and model
+    versions are unchanged since the last refresh.
+
+    Returns:
+        tuple: (raw frame, scores frame, stats dict, artifact path)
+    """
+    classifier = inference_model('classification')
+    regressor = inference_model('regression')
+    preprocessor = order_preprocessor()
+    version = '+'.join(model_registry.version(name) for name in ('classification', 'regression', 'encoder'))
+
+    raw = read_upload(os.path.join(UPLOAD_FOLDER, f"{file_name}.csv"))
+    previous = None
+    previous_path = find_frame(SCORES_DIR, f"{file_name}_scores")
+    if previous_path is not None and 'row_hash' in frame_columns(previous_path):
+        previous = read_frame(previous_path)
+
+    def score_rows(rows):
+        risk, days, _ = score_features(preprocessor.transform(rows), classifier, regressor)
+        return risk, days
+
+    scores, stats = refresh_scores(raw, previous, score_rows, version)
+    os.makedirs(SCORES_DIR, exist_ok=True)
+    output_path = write_frame(downcast(scores), frame_path(SCORES_DIR, f"{file_name}_scores"))
+    refresh_dashboard_summary(file_name)
+    return raw, scores, stats, output_path
+
+@app.route('/score', methods=['POST'])
+def score():
+    """
+    Runs classification and regression together on one read of the
+    processed features and saves a single artifact with 'risk' and 'days'
+    per order item.
+
+    With "sparse": true the raw upload is encoded straight to a sparse
+    matrix and scored in dense row blocks, skipping the processed frame.
+    With "incremental": true only rows of the raw upload that are new or
+    changed since the last incremental run are preprocessed and scored.
+    """
+    data = request.get_json(silent=True) or request.args
+    file_name = data.get('file_name')
+    sparse = str(data.get('sparse', '')).lower() in ('1', 'true')
+    incremental = str(data.get('incremental', '')).lower() in ('1', 'true')
+
+    if not file_name:
+        return jsonify({'error': 'Missing file_name parameter'}), 400
 
+    file_name = secure_filename(file_name)
+    if incremental:
+        if not os.path.isfile(os.path.join(UPLOAD_FOLDER, f"{file_name}.csv")):
+            return jsonify({'error': f"File not found: {os.path.join(UPLOAD_FOLDER, f'{file_name}.csv')}"}), 404
+        try:
+            _, scores, stats, output_path = score_incrementally(file_name)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
         return jsonify({
-            'predictions': predictions.tolist(),
+            'risk': scores['risk'].tolist(),
+            'days': scores['days'].tolist(),
+            'incremental': stats,
             'saved_to': output_path
         })
 
+    if sparse:
+        file_path = os.path.join(UPLOAD_FOLDER, f"{file_name}.csv")
+        if not os.path.isfile(file_path):
+            return jsonify({'error': f"File not found: {file_path}"}), 404
+    else:
+        file_path = find_frame(UPLOAD_FOLDER, f"{file_name}_processed")
+        if file_path is None:
+            return jsonify({'error': f"File not found: {frame_path(UPLOAD_FOLDER, f'{file_name}_processed')}"}), 404
+
+    try:
+        classifier = inference_model('classification')
+        regressor = inference_model('regression')
+    except Exception as e:
+        return jsonify({'error': f'Model could not be loaded: {e}'}), 500
+
+    try:
+        names = ('classification', 'regression', 'encoder') if sparse else ('classification', 'regression')
+        # 稀疏路徑直接以 encoder 編碼原始 CSV，encoder 更新後快取也須失效
+        versions = '+'.join(model_registry.version(name) for name in names)
+        key = prediction_cache.key('scores', [file_path], versions)
+        scores = prediction_cache.get(key)
+        cached = scores is not None
+        if cached:
+            risk, days = scores
+            shared = same_preprocessing(classifier, regressor)
+            id_columns = [column for column in ('Order Id', 'Order Item Id') if column in frame_columns(file_path)]
+            df = read_upload(file_path, usecols=id_columns) if sparse else read_frame(file_path, columns=id_columns)
+        elif sparse:
+            preprocessor = order_preprocessor()
+            df = read_upload(file_path)
+            matrix, columns = preprocessor.transform_sparse(df)
+            risk, days, shared = score_sparse(matrix, columns, classifier, regressor)
+        else:
+            df = read_frame(file_path)
+            risk, days, shared = score_features(df, classifier, regressor)
+        if not cached:
+            prediction_cache.put(key, np.vstack([risk, days]))
+
+        id_columns = [column for column in ('Order Id', 'Order Item Id') if column in df.columns]
+        result_df = df[id_columns].assign(risk=risk, days=days)
+
+        os.makedirs(SCORES_DIR, exist_ok=True)
+        output_path = write_frame(downcast(result_df), frame_path(SCORES_DIR, f"{file_name}_scores"))
+        refresh_dashboard_summary(file_name)
+
+        return jsonify({
+            'risk': risk.tolist(),
+            'days': days.tolist(),
+            'sharedPreprocessing': shared,
+            'sparse': sparse,
+            'saved_to': output_path,
+            'cached': cached
+        })
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def submit_orders(df):
+    """
+    Validates raw orders and scores them through the micro-batcher.
+    Returns ((risk, days, batch_rows), error_response).
+    """
+    try:
+        preprocessor = order_preprocessor()
+        preprocessor.validate(df)
+    except ValueError as e:
+        return None, (jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        return None, (jsonify({'error': f'Model could not be loaded: {e}'}), 500)
+
+    try:
+        # 只送出模型用到的欄位，欄位不同的請求才能合併成同一批
+        (risk, days), batch_rows = score_batcher.submit(df[preprocessor.input_columns])
+    except ValueError as e:
+        return None, (jsonify({'error': f'Invalid order data: {e}'}), 400)
+    except Exception as e:
+        return None, (jsonify({'error': str(e)}), 500)
+    return (risk, days, batch_rows), None
+
+def request_orders():
+    """
+    Orders posted to the in-memory scoring API: an Arrow IPC body, or JSON
+    with a list of records (or {"records": [...]}). Raises ValueError on
+    malformed or empty input.
+    """
+    if request.mimetype in (ARROW_STREAM, ARROW_FILE):
+        df = read_arrow(request.get_data())
+    else:
+        data = request.get_json(silent=True)
+        records = data.get('records') if isinstance(data, dict) else data
+        if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+            raise ValueError('Expected a JSON list of order records or {"records": [...]}')
+        df = pd.DataFrame.from_records(records)
+    if df.empty:
+        raise ValueError('No orders to score')
+    return df
+
+@app.route('/score_batch', methods=['POST'])
+def score_batch():
+    """
+    Scores raw orders posted in the request body (JSON records or an Arrow
+    batch) with both pipelines and returns 'risk' and 'days' per order in
+    input order, as JSON or, when the client accepts it, as an Arrow
+    stream. Nothing is written to disk; concurrent requests are scored
+    together in shared model calls.
+    """
+    try:
+        df = request_orders()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 415
+
+    scores, error = submit_orders(df)
+    if error:
+        return error
+    risk, days, batch_rows = scores
+
+    id_columns = [column for column in ('Order Id', 'Order Item Id') if column in df.columns]
+    if request.accept_mimetypes.best_match(['application/json', ARROW_STREAM]) == ARROW_STREAM:
+        result_df = df[id_columns].reset_index(drop=True).assign(risk=risk, days=days)
+        return Response(arrow_bytes(result_df), mimetype=ARROW_STREAM)
+    return jsonify({
+        **{column: df[column].tolist() for column in id_columns},
+        'risk': risk.tolist(),
+        'days': days.tolist(),
+        'batchRows': batch_rows
+    })
+
+@app.route('/score_order', methods=['POST'])
+def score_order():
+    """
+    Real-time scoring of a single order (one JSON record). Requests
+    arriving within SCORE_BATCH_MAX_WAIT_MS of each other share one model
+    call through the micro-batcher.
+    """
+    record = request.get_json(silent=True)
+    if not isinstance(record, dict):
+        return jsonify({'error': 'Expected one JSON order record'}), 400
+
+    scores, error = submit_orders(pd.DataFrame([record]))
+    if error:
+        return error
+    risk, days, batch_rows = scores
 
+    return jsonify({
+        **{column: record[column] for column in ('Order Id', 'Order Item Id') if column in record},
+        'risk': float(risk[0]),
+        'days': float(days[0]),
+        'batchRows': batch_rows
+    })
 
 @app.route('/api/dashboard/<filename>', methods=['GET'])
 def dashboard_data(filename):
-    PREDICTION_FOLDER = './backend/Classification_prediction'
     try:
         data_path = os.path.join(UPLOAD_FOLDER, f'{filename}.csv')
-        processed_path = os.path.join(UPLOAD_FOLDER, f'{filename}_processed.csv')
-        pred_path = os.path.join(PREDICTION_FOLDER, f'{filename}_prediction.csv')
-
-        df = pd.read_csv(data_path)
-        pred_df = pd.read_csv(pred_path)
-        processed_df = pd.read_csv(processed_path)
-
-        # Merge with prediction
-        merged = pd.merge(df, pred_df, on='Order Id', how='left')
-        merged['predicted_late'] = merged['PredictedValue'] > 0.5
-
-        # 1. Delays by Category
-        delay_by_category = (
-            merged.groupby('Category Name')['predicted_late']
-            .mean()
-            .sort_values(ascending=False)
-            .round(2)
-            .to_dict()
-        )
-
-        # 2. Shipment Delay Overview
-        shipment_overview = {
-            'Late': int(merged['predicted_late'].sum()),
-            'On Time': int((~merged['predicted_late']).sum())
-        }
-
-
-        xgb_model = model.named_steps['xgb']
-
-        # Get feature importances
-        feature_importances = xgb_model.feature_importances_
-
-        # Get feature names from the training data
-        feature_names = processed_df.columns
-
-        # Create a pandas Series for better visualization
-        feature_importances_series = pd.Series(feature_importances, index=feature_names)
-
-        # Sort feature importances in descending order
-        sorted_feature_importances = feature_importances_series.sort_values(ascending=False)
-
-        top_10_features = sorted_feature_importances.sort_values(ascending=False).head(10)
-
-        feature_importance_dict = {
-            str(k): float(v) for k, v in top_10_features.items()
-        }
-        #     'Shipping Mode': 0.22,
-        #     'Order Item Discount': 0.18,
-        #     'Order Region': 0.16,
-        #     'Product Category Id': 0.12,
-        #     'Order Item Quantity': 0.09,
-        #     'Customer Segment': 0.07,
-        #     'Sales per customer': 0.06,
-        #     'Order Profit Per Order': 0.05,
-        #     'Order Hour': 0.05
-        # }
+        if not os.path.isfile(data_path):
+            return jsonify({'error': f'No uploaded data for {filename}'}), 404
 
-        return jsonify({
-            'delayByCategory': delay_by_category,
-            'shipmentOverview': shipment_overview,
-            'featureImportance': feature_importance_dict
-        })
+        return jsonify(dashboard_summary(filename))
 
     except Exception as e:
         print(e)
         return jsonify({'error': str(e)}), 500
 
-@app.route('/tabu_optimize', methods=['POST'])
-def run_tabu():
-    print("📥 Received /tabu_optimize request")
-    csv_path = os.path.join(os.path.dirname(__file__), 'Regression_prediction', 'example_prediction.csv')
-    if not os.path.exists(csv_path):
-        return jsonify({'error': f'File not found: {csv_path}'}), 404
+@app.route('/api/dashboard/<filename>/delay', methods=['GET'])
+def dashboard_delay(filename):
+    """
+    Delay rate per value of one dimension (?dimension=Market) at any risk
+    threshold (?threshold=0.3, default 0.5), answered from the risk cube.
+    """
+    dimension = request.args.get('dimension', 'Category Name')
+    try:
+        threshold = float(request.args.get('threshold', 0.5))
+    except ValueError:
+        return jsonify({'error': 'threshold must be a number'}), 400
 
-    df = pd.read_csv(csv_path)
-    order_indices = list(df.index)
-    best_order, best_score = tabu_search(df, order_indices)
-    print("✅ Best order:", best_order)
-    print("✅ Best score:", best_score)
+    if not os.path.isfile(os.path.join(UPLOAD_FOLDER, f'{filename}.csv')):
+        return jsonify({'error': f'No uploaded data for {filename}'}), 404
+
+    try:
+        cube = dashboard_cube(filename)
+        if dimension not in cube.dimensions:
+            return jsonify({'error': f'Unknown dimension: {dimension}', 'dimensions': cube.dimensions}), 400
+        labels, late, rows, threshold = cube.late(dimension, threshold)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
     return jsonify({
+        'dimension': dimension,
+        'threshold': threshold,
+        'delayRate': dict(zip(labels.tolist(), (late / rows).round(4).tolist())),
+        'late': dict(zip(labels.tolist(), late.tolist())),
+        'rows': dict(zip(labels.tolist(), rows.tolist()))
+    })
+
+EXPORT_FOLDERS = {
+    'processed': (UPLOAD_FOLDER, '_processed'),
+    'classification': (CLASSIFICATION_DIR, '_prediction'),
+    'regression': (REGRESSION_DIR, '_prediction'),
+}
+
+@app.route('/export/<kind>/<file_name>', methods=['GET'])
+def export_csv(kind, file_name):
+    """Downloads a stored frame as CSV, streamed in row batches."""
+    if kind not in EXPORT_FOLDERS:
+        return jsonify({'error': f"Unknown export '{kind}'"}), 404
+    directory, suffix = EXPORT_FOLDERS[kind]
+    file_name = secure_filename(file_name)
+    path = find_frame(directory, f'{file_name}{suffix}')
+    if path is None:
+        return jsonify({'error': f'No {kind} data for {file_name}'}), 404
+    return Response(iter_csv(path), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={file_name}{suffix}.csv'})
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Per-stage latency, rows/sec and peak RSS in the Prometheus text format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/models', methods=['GET'])
+def model_info():
+    return jsonify({**model_registry.info(), 'predictionCache': prediction_cache.info(),
+                    'scoreBatcher': score_batcher.info()})
+
+OPTIMIZATION_OBJECTIVES = ('weighted_completion', 'expected_tardiness')
+
+def load_optimization_orders(data):
+    """
+    Loads the order table (risk + predicted shipping days per 'Order Id')
+    of the upload named by 'file_name' from the order store.
+    Returns (orders, error_response).
+    """
+    file_name = secure_filename(data.get('file_name') or 'example')
+    if not file_name:
+        return None, (jsonify({'error': 'Invalid file_name parameter'}), 400)
+    objective = data.get('objective', 'weighted_completion')
+    if objective not in OPTIMIZATION_OBJECTIVES:
+        return None, (jsonify({'error': f"Unknown objective '{objective}'"}), 400)
+
+    raw_path = None
+    if objective == 'expected_tardiness':
+        # 到期日來自原始上傳檔的 'Days for shipment (scheduled)'
+        raw_path = os.path.join(UPLOAD_FOLDER, f'{file_name}.csv')
+        if not os.path.exists(raw_path):
+            return None, (jsonify({'error': f'File not found: {raw_path}'}), 404)
+
+    try:
+        orders = order_store.get(file_name, raw_path)
+    except FileNotFoundError as e:
+        return None, (jsonify({'error': f'File not found: {e.filename}'}), 404)
+    return orders, None
+
+def optimization_result(orders, best_order, best_score, **summary):
+    return {
         "summary": {
-            "best_order": best_order
+            "best_order": orders.loc[best_order, 'Order Id'].astype(int).tolist(),
+            **summary
         },
         "bestScore": best_score,
-        "scoreHistory": []  # 如果你有歷程資料可以填，沒有就空陣列
-    })
+    }
+
+def optional_param(data, key, cast):
+    return cast(data[key]) if data.get(key) is not None else None
+
+def run_optimization(method, data, orders, run):
+    """
+    Runs ``run(progress) -> (best_order, best_score, summary)`` in the
+    request, or as a background job when the body sets "async": true.
+    """
+    time_limit = optional_param(data, 'time_limit', float)
+
+    def execute(progress):
+        iterations = 0
+
+        def counted(iteration, best_score):
+            nonlocal iterations
+            iterations += 1
+            return progress(iteration, best_score)
+
+        # 以迭代次數作為 rows，/metrics 的 rows/sec 即為每秒迭代數
+        with metrics.stage(f'optimize_{method}') as timer:
+            best_order, best_score, summary = run(counted)
+            timer.rows = iterations
+        print(f"✅ Best score ({method}):", best_score)
+        return optimization_result(orders, best_order, best_score, **summary)
+
+    if data.get('async'):
+        job = optimization_jobs.submit(method, execute, time_limit)
+        return jsonify({
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': url_for('optimization_job', job_id=job.id),
+        }), 202
+
+    job = OptimizationJob(method, time_limit)
+    job.started_at = time.time()
+    result = execute(job.progress)
+    result['scoreHistory'] = job.score_history
+    return jsonify(result)
+
+@app.route('/tabu_optimize', methods=['POST'])
+def run_tabu():
+    print("📥 Received /tabu_optimize request")
+    data = request.get_json(silent=True) or {}
+    orders, error = load_optimization_orders(data)
+    if error:
+        return error
+
+    try:
+        seed = optional_param(data, 'seed', int)
+        time_limit = optional_param(data, 'time_limit', float)
+        # 行程數限制在 1 到 CPU 核心數之間
+        workers = pool_workers(optional_param(data, 'workers', int)) if 'workers' in data else None
+        starts = int(data.get('starts', workers or 4))
+        if starts < 1:
+            raise ValueError('starts must be at least 1')
+        if seed is not None and seed < 0:
+            raise ValueError('seed must be non-negative')
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid tabu parameters: {e}'}), 400
+
+    if 'starts' in data or 'workers' in data:
+        # multi-start: 多組 seed 的 tabu search 平行執行，取最佳解
+        def run(progress):
+            best_order, best_score, runs = multi_start_tabu(
+                orders, starts=starts, workers=workers, seed=seed, time_limit=time_limit, callback=progress)
+            return best_order, best_score, runs
+    else:
+        def run(progress):
+            best_order, best_score = tabu_search(
+                orders, list(orders.index), seed=seed, time_limit=time_limit, callback=progress)
+            return best_order, best_score, {}
+
+    return run_optimization('tabu', data, orders, run)
 
 @app.route('/ga_optimize', methods=['POST'])
 def run_ga():
     print("📥 Received /ga_optimize request")
-    csv_path = os.path.join(os.path.dirname(__file__), 'Regression_prediction', 'example_prediction.csv')
-    if not os.path.exists(csv_path):
-        return jsonify({'error': f'File not found: {csv_path}'}), 404
+    data = request.get_json(silent=True) or {}
+    orders, error = load_optimization_orders(data)
+    if error:
+        return error
 
-    df = pd.read_csv(csv_path)
-    order_indices = list(df.index)
-    best_order, best_score = genetic(df)
-    print("✅ Best order:", best_order)
-    print("✅ Best score:", best_score)
+    try:
+        seed = optional_param(data, 'seed', int)
+        # 行程數限制在 1 到 CPU 核心數之間
+        workers = pool_workers(optional_param(data, 'workers', int)) if 'workers' in data else None
+        islands = int(data.get('islands', workers or 4))
+        if islands < 1:
+            raise ValueError('islands must be at least 1')
+        migration_interval = int(data.get('migration_interval', 10))
+        migration_size = int(data.get('migration_size', 2))
+        optional_param(data, 'time_limit', float)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid GA parameters: {e}'}), 400
+
+    if 'workers' in data or 'islands' in data:
+        # island model: 多個族群在 process pool 中平行演化
+        def run(progress):
+            best_order, best_score, island_history = island_genetic(
+                orders, islands=islands, workers=workers, migration_interval=migration_interval,
+                migration_size=migration_size, seed=seed, callback=progress)
+            return best_order, best_score, {'island_history': island_history}
+    else:
+        def run(progress):
+            best_order, best_score = genetic(orders, seed=seed, callback=progress)
+            return best_order, best_score, {}
+
+    return run_optimization('ga', data, orders, run)
+
+@app.route('/optimize', methods=['POST'])
+def run_optimize():
+    print("📥 Received /optimize request")
+    data = request.get_json(silent=True) or {}
+    orders, error = load_optimization_orders(data)
+    if error:
+        return error
+
+    method = data.get('method', 'auto')
+    if method not in METHODS:
+        return jsonify({'error': f"Unknown method '{method}', expected one of {METHODS}"}), 400
+    try:
+        optional_param(data, 'time_limit', float)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid time_limit: {e}'}), 400
 
-    return jsonify({
-        "summary": {
-            "best_order": best_order
-        },
-        "bestScore": best_score,
-        "scoreHistory": []  # 如果你有歷程資料可以填，沒有就空陣列
-    })
+    def run(progress):
+        best_order, best_score, used_method = solve(orders, method, callback=progress)
+        return best_order, best_score, {'method': used_method}
 
+    try:
+        return run_optimization(method, data, orders, run)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/optimize_jobs/<job_id>', methods=['GET'])
+def optimization_job(job_id):
+    job = optimization_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    since = request.args.get('since', 0, type=int)
+    return jsonify(job.to_dict(since))
+
+@app.route('/optimize_jobs/<job_id>/stream', methods=['GET'])
+def stream_optimization_job(job_id):
+    """Server-sent events: one 'progress' event per new best score batch."""
+    job = optimization_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+
+    since = request.args.get('since', 0, type=int)
+
+    def events():
+        seen = since
+        while True:
+            job.wait(seen, timeout=15)
+            data = job.to_dict(seen)
+            seen = data['historyLength']
+            if job.finished:
+                yield f"event: done\ndata: {json.dumps(data)}\n\n"
+                return
+            yield f"event: progress\ndata: {json.dumps(data)}\n\n"
+
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@app.route('/optimize_jobs/<job_id>', methods=['DELETE'])
+def cancel_optimization_job(job_id):
+    job = optimization_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    return jsonify(job.to_dict(len(job.score_history)))
 
 
 if __name__ == '__main__':
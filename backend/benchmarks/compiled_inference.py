@@ -0,0 +1,81 @@
+"""
+Checks that CompiledPipeline predicts exactly what the sklearn pipelines
+predict, and compares their latency.
+
+The processed rows of --csv (tiled --repeat times) are scored by both
+pipelines and by their compiled versions at each --threads count; any
+difference in the outputs is reported and makes the script exit with
+status 1.
+
+Usage:
+    python backend/benchmarks/compiled_inference.py [--csv path] [--repeat 1] [--threads 1 0]
+"""
+import argparse
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from utils.inference import CompiledPipeline
+from utils.models import MODEL_PATHS
+from utils.preprocess import OrderPreprocessor, read_upload
+from utils.storage import downcast
+
+
+def timed(predict, features, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        values = predict(features)
+        best = min(best, time.perf_counter() - start)
+    return values, best
+
+
+def run(csv_path, repeat, threads):
+    encoder = joblib.load(MODEL_PATHS['encoder'])
+    pipelines = {
+        'classification': joblib.load(MODEL_PATHS['classification']),
+        'regression': joblib.load(MODEL_PATHS['regression']),
+    }
+    preprocessor = OrderPreprocessor(encoder, pipelines['classification'].feature_names_in_)
+    sample = read_upload(csv_path)
+    # 與 /upload 存檔後再讀回的特徵型別相同
+    features = downcast(preprocessor.transform(pd.concat([sample] * repeat, ignore_index=True)))
+
+    rows, identical = [], True
+    for name, pipeline in pipelines.items():
+        if name == 'classification':
+            reference, seconds = timed(lambda X: pipeline.predict_proba(X)[:, 1], features)
+        else:
+            reference, seconds = timed(pipeline.predict, features)
+        rows.append({'model': name, 'path': 'pipeline', 'threads': None, 'seconds': seconds, 'max_abs_diff': 0.0})
+        print(f"{name:<15} pipeline            {seconds:8.3f}s")
+
+        for n_threads in threads:
+            compiled = CompiledPipeline(pipeline, n_threads=n_threads)
+            values, seconds = timed(compiled.predict, features)
+            same = np.array_equal(values, reference)
+            identical &= same
+            diff = float(np.abs(values - reference).max())
+            rows.append({'model': name, 'path': 'compiled', 'threads': n_threads, 'seconds': seconds,
+                         'max_abs_diff': diff})
+            print(f"{name:<15} compiled threads={n_threads or 'default':<7} {seconds:8.3f}s  "
+                  f"{'identical' if same else f'max |diff| = {diff:.3g}'}")
+    return pd.DataFrame(rows), identical
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--csv', default=os.path.join(BACKEND_DIR, 'test', 'df_trying_subset.csv'))
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 0],
+                        help='XGBoost thread counts to try; 0 keeps the booster default')
+    args = parser.parse_args()
+    _, identical = run(args.csv, args.repeat, args.threads)
+    sys.exit(0 if identical else 1)
@@ -0,0 +1,83 @@
+"""
+Single-order scoring throughput with and without the MicroBatcher that
+fronts /score_batch and /score_order.
+
+--clients threads each score their share of --orders one-row orders,
+either calling the pipelines directly (one model call per order) or
+through a MicroBatcher with --max-rows / --max-wait-ms, and the run
+reports orders/sec and per-order latency percentiles.
+
+Usage:
+    python backend/benchmarks/micro_batching.py [--orders 2000] [--clients 32] [--max-wait-ms 5]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from utils.batching import MicroBatcher
+from utils.inference import score_features
+from utils.models import MODEL_PATHS
+from utils.preprocess import OrderPreprocessor, read_upload
+
+
+def measure(name, score_one, orders, clients):
+    latencies = np.zeros(len(orders))
+
+    def client(offset):
+        for k in range(offset, len(orders), clients):
+            start = time.perf_counter()
+            score_one(orders[k])
+            latencies[k] = time.perf_counter() - start
+
+    threads = [threading.Thread(target=client, args=(offset,)) for offset in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    print(f"{name:<10} {len(orders) / elapsed:10,.0f} orders/s  p50={p50:8.2f} ms  p99={p99:8.2f} ms")
+    return {'mode': name, 'orders_per_second': len(orders) / elapsed, 'p50_ms': p50, 'p99_ms': p99}
+
+
+def run(csv_path, n_orders, clients, max_rows, max_wait_ms):
+    encoder = joblib.load(MODEL_PATHS['encoder'])
+    classifier = joblib.load(MODEL_PATHS['classification'])
+    regressor = joblib.load(MODEL_PATHS['regression'])
+    preprocessor = OrderPreprocessor(encoder, classifier.feature_names_in_)
+
+    def score(df):
+        risk, days, _ = score_features(preprocessor.transform(df), classifier, regressor)
+        return risk, days
+
+    sample = read_upload(csv_path)
+    orders = [sample.iloc[[k % len(sample)]] for k in range(n_orders)]
+
+    direct = measure('direct', score, orders, clients)
+    batcher = MicroBatcher(score, max_rows=max_rows, max_wait=max_wait_ms / 1000)
+    batched = measure('batched', batcher.submit, orders, clients)
+    print(f"mean batch {batcher.info()['meanBatchRows']:.1f} orders, "
+          f"speed-up x{batched['orders_per_second'] / direct['orders_per_second']:.1f}")
+    return pd.DataFrame([direct, batched])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--csv', default=os.path.join(BACKEND_DIR, 'test', 'df_trying_subset.csv'))
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--max-rows', type=int, default=8192)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    args = parser.parse_args()
+    run(args.csv, args.orders, args.clients, args.max_rows, args.max_wait_ms)
@@ -0,0 +1,52 @@
+"""
+Compares the exact sort-based solver with the genetic and tabu search
+optimizers on score and runtime.
+
+Usage:
+    python backend/benchmarks/optimizers.py [--sizes 100 1000 5000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from optimization.exact import exact_search
+from optimization.ga import genetic
+from optimization.orders import load_order_table
+from optimization.tabu import tabu_search
+
+OPTIMIZERS = {
+    'exact': lambda orders: exact_search(orders),
+    'tabu_search': lambda orders: tabu_search(orders, list(orders.index)),
+    'genetic': lambda orders: genetic(orders),
+}
+
+
+def run(sizes, skip=()):
+    # risk + predicted shipping days per order, scored as weighted completion time
+    orders = load_order_table('df_trying_subset')
+    rows = []
+    for size in sizes:
+        batch = orders.iloc[:size].reset_index(drop=True)
+        for name, optimizer in OPTIMIZERS.items():
+            if name in skip:
+                continue
+            start = time.perf_counter()
+            _, score = optimizer(batch)
+            elapsed = time.perf_counter() - start
+            rows.append({'orders': len(batch), 'optimizer': name, 'score': score, 'seconds': elapsed})
+            print(f"{len(batch):>6} orders  {name:<12} score={score:>16.2f}  {elapsed:8.3f}s")
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--skip', nargs='*', default=[], choices=list(OPTIMIZERS))
+    args = parser.parse_args()
+    run(args.sizes, args.skip)
@@ -0,0 +1,219 @@
+"""
+End-to-end benchmark of the prediction pipeline on synthetic DataCo
+batches: preprocess_uploaded_dataframe, both pipelines' predictions, the
+dashboard aggregation, and genetic / tabu_search at several order
+counts. Each stage reports seconds, throughput and peak traced memory.
+
+Batches larger than --chunk-rows are preprocessed and scored chunk by
+chunk, as /upload streams them, so a 1M-row batch never holds its whole
+dense feature matrix; the peak memory of those stages is the largest
+chunk's.
+
+Peak memory is traced with tracemalloc, which slows allocation-heavy
+stages (date parsing, the month bucketing); --no-memory times them
+without it.
+
+Results are written as JSON. With --baseline, the run is compared to an
+earlier results file and exits with status 1 when a stage's throughput
+dropped by more than --tolerance.
+
+Usage:
+    python backend/benchmarks/pipeline.py [--sizes 1000 10000 100000 1000000]
+        [--orders 100 1000 5000] [--output results.json] [--baseline old.json]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+import xgboost
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.synthetic import DEFAULT_SAMPLE, synthetic_orders
+from optimization.ga import genetic
+from optimization.orders import build_order_table
+from optimization.tabu import tabu_search
+from utils.dashboard import RiskCube, build_summary, risk_per_row
+from utils.models import MODEL_PATHS, file_version
+from utils.preprocess import preprocess_uploaded_dataframe, read_upload
+
+RESULTS_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'results')
+
+
+class Stage:
+    """Accumulates the time and peak traced memory of one stage over several calls."""
+
+    # Set from --no-memory
+    trace_memory = True
+
+    def __init__(self, name, rows):
+        self.name = name
+        self.rows = rows
+        self.seconds = 0.0
+        self.peak = 0
+
+    def run(self, func, *args, **kwargs):
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.seconds += time.perf_counter() - start
+            if self.trace_memory:
+                self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+
+    def result(self, **extra):
+        result = {
+            'stage': self.name, 'rows': self.rows, 'seconds': round(self.seconds, 6),
+            'rows_per_second': round(self.rows / self.seconds, 1) if self.seconds > 0 else None,
+            'peak_mib': round(self.peak / 2**20, 2) if self.trace_memory else None, **extra,
+        }
+        peak = f"  peak={self.peak / 2**20:9.1f} MiB" if self.trace_memory else ''
+        print(f"{self.name:<24} rows={self.rows:>8}  {self.seconds:8.3f}s  "
+              f"{result['rows_per_second'] or 0:>12,.0f} rows/s{peak}")
+        return result
+
+
+def score_batch(raw, models, chunk_rows):
+    """Preprocesses and scores one batch; returns (stage results, risk, days)."""
+    encoder, classifier, regressor = models
+    stages = [Stage(name, len(raw)) for name in ('preprocess', 'predict_classification', 'predict_regression')]
+    risk, days = [], []
+    for start in range(0, len(raw), chunk_rows):
+        chunk = raw.iloc[start:start + chunk_rows]
+        features = stages[0].run(preprocess_uploaded_dataframe, chunk, encoder=encoder, verbose=False,
+                                 feature_names=classifier.feature_names_in_)
+        risk.append(stages[1].run(classifier.predict_proba, features)[:, 1])
+        days.append(stages[2].run(regressor.predict, features))
+        del features
+    return [stage.result() for stage in stages], np.concatenate(risk), np.concatenate(days)
+
+
+def dashboard(raw, risk, classifier):
+    stage = Stage('dashboard_aggregation', len(raw))
+    predictions = raw[['Order Id', 'Order Item Id']].assign(PredictedValue=risk)
+
+    def aggregate():
+        cube = RiskCube.build(raw, risk_per_row(raw, predictions))
+        return build_summary(cube, classifier.named_steps['xgb'].feature_importances_, classifier.feature_names_in_)
+
+    stage.run(aggregate)
+    return stage.result()
+
+
+def optimizers(orders, counts, seed):
+    results = []
+    for count in counts:
+        batch = orders.iloc[:count].reset_index(drop=True)
+        for name, optimize in (('genetic', lambda b: genetic(b, seed=seed)),
+                               ('tabu_search', lambda b: tabu_search(b, list(b.index), seed=seed))):
+            stage = Stage(name, len(batch))
+            _, score = stage.run(optimize, batch)
+            results.append(stage.result(score=float(score)))
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'xgboost': xgboost.__version__,
+        'models': {name: file_version(path) for name, path in MODEL_PATHS.items()},
+    }
+
+
+def run(sizes, order_counts, chunk_rows=100_000, seed=0, sample_path=DEFAULT_SAMPLE):
+    models = tuple(joblib.load(MODEL_PATHS[name]) for name in ('encoder', 'classification', 'regression'))
+    sample = read_upload(sample_path)
+    results = []
+    orders = None
+    for size in sizes:
+        print(f"--- {size} rows")
+        raw = synthetic_orders(size, sample, seed)
+        stages, risk, days = score_batch(raw, models, chunk_rows)
+        results += stages
+        results.append(dashboard(raw, risk, models[1]))
+        if orders is None or len(orders) < max(order_counts, default=0):
+            ids = raw[['Order Id']]
+            orders = build_order_table(ids.assign(PredictedValue=risk), ids.assign(PredictedValue=days))
+        del raw
+
+    if order_counts:
+        print("--- optimizers")
+        results += optimizers(orders, order_counts, seed)
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'seed': seed,
+        'chunk_rows': chunk_rows,
+        'trace_memory': Stage.trace_memory,
+        'environment': environment(),
+        'results': results,
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Stages whose throughput fell more than ``tolerance`` below the baseline's."""
+    previous = {(r['stage'], r['rows']): r for r in baseline['results']}
+    regressions = []
+    for result in report['results']:
+        before = previous.get((result['stage'], result['rows']))
+        if before is None or not before['rows_per_second'] or not result['rows_per_second']:
+            continue
+        ratio = result['rows_per_second'] / before['rows_per_second']
+        if ratio < 1 - tolerance:
+            regressions.append({'stage': result['stage'], 'rows': result['rows'], 'ratio': round(ratio, 3)})
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument('--orders', type=int, nargs='*', default=[100, 1_000, 5_000])
+    parser.add_argument('--chunk-rows', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sample', default=DEFAULT_SAMPLE)
+    parser.add_argument('--no-memory', action='store_true', help='skip tracemalloc for undisturbed timings')
+    parser.add_argument('--output', help='results JSON (default: benchmarks/results/pipeline-<time>.json)')
+    parser.add_argument('--baseline', help='earlier results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed relative throughput drop before a stage counts as a regression')
+    args = parser.parse_args()
+
+    Stage.trace_memory = not args.no_memory
+    report = run(args.sizes, args.orders, args.chunk_rows, args.seed, args.sample)
+    output = args.output or os.path.join(RESULTS_DIR, f"pipeline-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression['stage']} at {regression['rows']} rows: "
+                  f"{regression['ratio']:.0%} of baseline throughput")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,83 @@
+"""
+Compares the dense one-hot feature path (OrderPreprocessor.transform)
+with the sparse one (transform_sparse + block-wise scoring) on
+feature memory, peak traced memory and latency.
+
+The rows of --csv are tiled --repeat times; the default sample tiled 36
+times is about the size of the full DataCo dataset (180k rows).
+
+Usage:
+    python backend/benchmarks/sparse_features.py [--csv path] [--repeat 36]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import joblib
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from utils.inference import DENSE_BLOCK_ROWS, score_features, score_sparse
+from utils.models import MODEL_PATHS
+from utils.preprocess import OrderPreprocessor, read_upload
+
+
+def dense_path(raw, preprocessor, classifier, regressor):
+    features = preprocessor.transform(raw)
+    feature_bytes = int(features.memory_usage(index=False).sum())
+    risk, days, _ = score_features(features, classifier, regressor)
+    return risk, days, feature_bytes
+
+
+def sparse_path(raw, preprocessor, classifier, regressor, block_rows):
+    matrix, columns = preprocessor.transform_sparse(raw)
+    feature_bytes = matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+    risk, days, _ = score_sparse(matrix, columns, classifier, regressor, block_rows)
+    return risk, days, feature_bytes
+
+
+def measure(name, run, raw):
+    tracemalloc.start()
+    start = time.perf_counter()
+    risk, days, feature_bytes = run(raw)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<7} rows={len(raw):>8}  features={feature_bytes / 2**20:9.1f} MiB  "
+          f"peak={peak / 2**20:9.1f} MiB  {elapsed:8.2f}s")
+    return {'path': name, 'rows': len(raw), 'feature_mib': feature_bytes / 2**20,
+            'peak_mib': peak / 2**20, 'seconds': elapsed}, risk, days
+
+
+def run(csv_path, repeat, block_rows):
+    encoder = joblib.load(MODEL_PATHS['encoder'])
+    classifier = joblib.load(MODEL_PATHS['classification'])
+    regressor = joblib.load(MODEL_PATHS['regression'])
+    preprocessor = OrderPreprocessor(encoder, classifier.feature_names_in_)
+
+    sample = read_upload(csv_path)
+    raw = pd.concat([sample] * repeat, ignore_index=True)
+
+    dense, dense_risk, dense_days = measure(
+        'dense', lambda df: dense_path(df, preprocessor, classifier, regressor), raw)
+    sparse, sparse_risk, sparse_days = measure(
+        'sparse', lambda df: sparse_path(df, preprocessor, classifier, regressor, block_rows), raw)
+
+    # 兩條路徑的預測結果應一致
+    print(f"max |risk diff| = {np.abs(dense_risk - sparse_risk).max():.3g}  "
+          f"max |days diff| = {np.abs(dense_days - sparse_days).max():.3g}")
+    return pd.DataFrame([dense, sparse])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--csv', default=os.path.join(BACKEND_DIR, 'test', 'df_trying_subset.csv'))
+    parser.add_argument('--repeat', type=int, default=36)
+    parser.add_argument('--block-rows', type=int, default=DENSE_BLOCK_ROWS)
+    args = parser.parse_args()
+    run(args.csv, args.repeat, args.block_rows)
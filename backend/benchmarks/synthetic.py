@@ -0,0 +1,80 @@
+"""
+Generates synthetic DataCo-shaped order batches of any size.
+
+Rows are resampled from a real sample (df_trying_subset.csv by default),
+so every categorical value is one the encoder knows, and then made
+unique: orders of 1-5 items get fresh 'Order Id' / 'Order Item Id'
+values, order dates are spread over the sample's date range with the
+shipping date following after the real shipping days, and amounts are
+jittered by ±20%. The same seed always gives the same batch.
+
+Usage:
+    python backend/benchmarks/synthetic.py --rows 100000 --output orders_100k.csv
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from utils.preprocess import DATE_COLUMNS, DATE_FORMAT, read_upload
+
+DEFAULT_SAMPLE = os.path.join(BACKEND_DIR, 'test', 'df_trying_subset.csv')
+
+# Amount columns jittered per row
+AMOUNT_COLUMNS = [
+    'Sales', 'Order Item Total', 'Sales per customer', 'Benefit per order',
+    'Order Profit Per Order', 'Order Item Discount',
+]
+
+
+def synthetic_orders(rows, sample=None, seed=0, max_items=5):
+    """
+    Args:
+        rows (int): Order item rows to generate.
+        sample (pd.DataFrame, optional): Raw DataCo rows to resample; read
+            from DEFAULT_SAMPLE when omitted.
+        seed (int): Random seed.
+        max_items (int): Largest number of items per order.
+
+    Returns:
+        pd.DataFrame: A raw upload with the sample's columns and dtypes.
+    """
+    if sample is None:
+        sample = read_upload(DEFAULT_SAMPLE)
+    rng = np.random.default_rng(seed)
+    df = sample.iloc[rng.integers(0, len(sample), rows)].reset_index(drop=True)
+
+    # 每張訂單 1~max_items 個品項，訂單與品項編號重新編排
+    sizes = rng.integers(1, max_items + 1, rows)
+    df['Order Id'] = np.repeat(np.arange(1, rows + 1, dtype=np.int32), sizes)[:rows]
+    df['Order Item Id'] = np.arange(1, rows + 1, dtype=np.int32)
+
+    order_dates = pd.to_datetime(sample[DATE_COLUMNS['Order']], format=DATE_FORMAT)
+    first, last = order_dates.min().value // 60_000_000_000, order_dates.max().value // 60_000_000_000
+    # 同一張訂單的品項共用下單時間
+    order_minutes = rng.integers(first, last + 1, int(df['Order Id'].iloc[-1]))[df['Order Id'].to_numpy() - 1]
+    ordered = pd.to_datetime(order_minutes, unit='m')
+    shipped = ordered + pd.to_timedelta(df['Days for shipping (real)'].to_numpy(), unit='D')
+    df[DATE_COLUMNS['Order']] = ordered.strftime(DATE_FORMAT)
+    df[DATE_COLUMNS['Shipping']] = shipped.strftime(DATE_FORMAT)
+
+    for column in AMOUNT_COLUMNS:
+        if column in df.columns:
+            df[column] = (df[column] * rng.uniform(0.8, 1.2, rows)).astype(df[column].dtype)
+    return df
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sample', default=DEFAULT_SAMPLE)
+    parser.add_argument('--output', required=True)
+    args = parser.parse_args()
+    synthetic_orders(args.rows, read_upload(args.sample), args.seed).to_csv(args.output, index=False)
+    print(f"Wrote {args.rows} rows to {args.output}")
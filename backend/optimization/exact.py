@@ -0,0 +1,36 @@
+import numpy as np
+
+from optimization.scoring import OrderScorer
+
+
+def exact_sequence(scorer):
+    """
+    Returns the optimal sequence (row positions) for objectives with a
+    known closed-form solution.
+
+    Weighted completion time sum(risk * C) is minimized by Smith's
+    weighted-shortest-processing-time rule: order by risk / days,
+    descending. With unit days this is the plain descending-risk sort
+    that minimizes the position penalty sum(risk * (position + 1)).
+    """
+    if not scorer.is_linear:
+        raise ValueError("Expected tardiness has no exact sort-based solution")
+    if scorer.unit_durations:
+        priority = scorer.values
+    else:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            priority = scorer.values / scorer.durations
+        # 零工期的訂單不會延後任何人，直接排最前面
+        priority = np.where(scorer.durations > 0, priority, np.inf)
+    # stable sort keeps ties in their original row order
+    return np.argsort(-priority, kind='stable')
+
+
+def exact_search(orders, order_indices=None):
+    scorer = OrderScorer.from_orders(orders)
+    sequence = exact_sequence(scorer)
+    if order_indices is not None:
+        wanted = np.zeros(len(orders), dtype=bool)
+        wanted[scorer.positions(orders, order_indices)] = True
+        sequence = sequence[wanted[sequence]]
+    return orders.index[sequence].tolist(), scorer.score(sequence)
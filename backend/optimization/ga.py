@@ -1,78 +1,103 @@
 import numpy as np
-import random
-
-def fitness(individual, orders):
-    score = 0
-    current_time = 0
-    for position, idx in enumerate(individual):
-        predicted_risk = orders.loc[idx, 'PredictedValue']
-        shipping_days = 1
-        # 排序越後面，懲罰越高
-        delay_penalty = predicted_risk * (position + 1)
-
-        score += delay_penalty
-        current_time += shipping_days
-
-    return score
-
-def create_individual(order_indices):
-    ind = order_indices.copy()
-    random.shuffle(ind)
-    return ind
-
-def crossover(parent1, parent2):
-    # Order 1 crossover (OX1)
-    size = len(parent1)
-    a, b = sorted(random.sample(range(size), 2))
-    child = [None]*size
-    child[a:b] = parent1[a:b]
-    fill = [item for item in parent2 if item not in child]
-    pointer = 0
-    for i in range(size):
-        if child[i] is None:
-            child[i] = fill[pointer]
-            pointer += 1
-    return child
-
-def mutate(individual, mutation_rate=0.3):
-    for i in range(len(individual)):
-        if random.random() < mutation_rate:
-            j = random.randint(0, len(individual)-1)
-            individual[i], individual[j] = individual[j], individual[i]
-    return individual
-
-def select(population, fitnesses, k=3):
-    # Tournament selection
-    selected = []
-    for _ in range(len(population)):
-        aspirants = random.sample(list(zip(population, fitnesses)), k)
-        winner = min(aspirants, key=lambda x: x[1])
-        selected.append(winner[0])
-    return selected
-
-def genetic(orders, population_size=30, generations=30, mutation_rate=0.2, verbose=False):
-    order_indices = list(orders.index)
-    population = [create_individual(order_indices) for _ in range(population_size)]
+
+from optimization.scoring import OrderScorer, fitness
+
+# 族群以 (population_size, n_orders) 的整數陣列表示，每列是一個排列
+
+def create_population(size, population_size, rng):
+    population = np.tile(np.arange(size, dtype=np.int32), (population_size, 1))
+    return rng.permuted(population, axis=1)
+
+def crossover(parents1, parents2, rng):
+    """
+    Order 1 crossover (OX1) for a batch of parent pairs.
+
+    Each child copies a random slice of parent1 in place and fills the
+    remaining positions with the missing orders in parent2's order, using
+    boolean masks instead of list membership tests.
+    """
+    count, size = parents1.shape
+    rows = np.arange(count)[:, np.newaxis]
+    cut1 = rng.integers(0, size, count)
+    cut2 = (cut1 + rng.integers(1, size, count)) % size
+    a = np.minimum(cut1, cut2)[:, np.newaxis]
+    b = np.maximum(cut1, cut2)[:, np.newaxis]
+
+    segment = (np.arange(size) >= a) & (np.arange(size) < b)
+    # taken[r, v]: order v is already in child r's copied slice
+    taken = np.empty((count, size), dtype=bool)
+    taken[rows, parents1] = segment
+
+    children = np.where(segment, parents1, 0)
+    # 每列未被取用的數量恰好等於空位數，依列優先順序填入即可
+    children[~segment] = parents2[~taken[rows, parents2]]
+    return children
+
+def mutate(population, mutation_rate, rng):
+    """
+    Swap mutation: every position is swapped with probability mutation_rate.
+
+    The swaps of one individual are drawn as disjoint position pairs so they
+    can be applied at once across the whole population.
+    """
+    count, size = population.shape
+    swaps = np.minimum(rng.binomial(size, mutation_rate, count), size // 2)
+    most = swaps.max()
+    if most == 0:
+        return population
+
+    picks = np.argpartition(rng.random((count, size), dtype=np.float32), 2 * most - 1, axis=1)[:, :2 * most]
+    mask = np.arange(most) < swaps[:, np.newaxis]
+    rows = np.broadcast_to(np.arange(count)[:, np.newaxis], mask.shape)[mask]
+    first = picks[:, 0::2][mask]
+    second = picks[:, 1::2][mask]
+    population[rows, first], population[rows, second] = population[rows, second], population[rows, first]
+    return population
+
+def select(fitnesses, rng, k=3):
+    """Tournament selection; returns the indices of the winners."""
+    count = len(fitnesses)
+    if count > k:
+        aspirants = np.argpartition(rng.random((count, count)), k - 1, axis=1)[:, :k]
+    else:
+        aspirants = rng.integers(0, count, (count, k))
+    return aspirants[np.arange(count), np.argmin(fitnesses[aspirants], axis=1)]
+
+def next_generation(population, fitnesses, mutation_rate, rng):
+    count = len(population)
+    selected = population[select(fitnesses, rng)]
+    # 兩兩配對，每對產生 (p1, p2) 與 (p2, p1) 兩個子代
+    slot = np.arange(count)
+    first = slot - slot % 2
+    second = (first + 1) % count
+    is_first = slot % 2 == 0
+    parents1 = selected[np.where(is_first, first, second)]
+    parents2 = selected[np.where(is_first, second, first)]
+    return mutate(crossover(parents1, parents2, rng), mutation_rate, rng)
+
+def genetic(orders, population_size=30, generations=30, mutation_rate=0.2, verbose=False, seed=None,
+            callback=None):
+    # callback(generation, best_score) 回傳 True 時提前停止
+    if len(orders) < 2:
+        return list(orders.index), fitness(list(orders.index), orders)
+
+    rng = np.random.default_rng(seed)
+    scorer = OrderScorer.from_orders(orders)
+    population = create_population(len(orders), population_size, rng)
 
     best_individual = None
     best_fitness = float('inf')
 
     for gen in range(generations):
-        fitnesses = [fitness(ind, orders) for ind in population]
+        fitnesses = scorer.score_population(population)
         best_idx = np.argmin(fitnesses)
         if fitnesses[best_idx] < best_fitness:
-            best_fitness = fitnesses[best_idx]
-            best_individual = population[best_idx]
+            best_fitness = float(fitnesses[best_idx])
+            best_individual = population[best_idx].copy()
         if verbose:
             print(f"Generation {gen+1}: Best fitness = {fitnesses[best_idx]}")
-        selected = select(population, fitnesses)
-        next_population = []
-        for i in range(0, population_size, 2):
-            parent1 = selected[i]
-            parent2 = selected[(i+1) % population_size]
-            child1 = crossover(parent1, parent2)
-            child2 = crossover(parent2, parent1)
-            next_population.extend([child1, child2])
-        population = [mutate(ind, mutation_rate) for ind in next_population[:population_size]]
-
-    return best_individual, best_fitness
\ No newline at end of file
+        if callback is not None and callback(gen + 1, best_fitness):
+            break
+        population = next_generation(population, fitnesses, mutation_rate, rng)
+
+    return orders.index[best_individual].tolist(), best_fitness
@@ -0,0 +1,167 @@
+import numpy as np
+
+from optimization.ga import create_population, next_generation
+from optimization.scoring import OrderScorer, fitness
+from optimization.shared import SharedArray, get_pool, pool_workers, run_bounded, share_scorer
+
+MAX_ISLANDS = 64
+# 所有族群放在共用記憶體中，總大小不超過此上限
+MAX_POPULATION_BYTES = 256 * 2 ** 20
+
+
+def _evolve(scorer, population, best, best_fitness, generations, mutation_rate, rng):
+    history = []
+    for _ in range(generations):
+        fitnesses = scorer.score_population(population)
+        best_idx = np.argmin(fitnesses)
+        if fitnesses[best_idx] < best_fitness:
+            best_fitness = float(fitnesses[best_idx])
+            best[:] = population[best_idx]
+        history.append(best_fitness)
+        population[:] = next_generation(population, fitnesses, mutation_rate, rng)
+
+    # 回傳最後一代的分數，主程序據此挑選遷移個體
+    fitnesses = scorer.score_population(population)
+    best_idx = np.argmin(fitnesses)
+    if fitnesses[best_idx] < best_fitness:
+        best_fitness = float(fitnesses[best_idx])
+        best[:] = population[best_idx]
+    return best_fitness, fitnesses, history
+
+
+def _run_island(order_specs, population_spec, best_spec, island, best_fitness, generations, mutation_rate, seed):
+    """Evolves one island in place inside a worker process."""
+    shared = {key: SharedArray.attach(spec) for key, spec in order_specs.items()}
+    populations = SharedArray.attach(population_spec)
+    bests = SharedArray.attach(best_spec)
+    try:
+        return _evolve_attached(shared, populations, bests, island, best_fitness, generations, mutation_rate, seed)
+    finally:
+        for array in (*shared.values(), populations, bests):
+            array.close()
+
+
+def _evolve_attached(shared, populations, bests, island, best_fitness, generations, mutation_rate, seed):
+    durations = shared['durations'].array if 'durations' in shared else None
+    due_dates = shared['due_dates'].array if 'due_dates' in shared else None
+    scorer = OrderScorer(shared['values'].array, durations, due_dates)
+    return _evolve(scorer, populations.array[island], bests.array[island], best_fitness,
+                   generations, mutation_rate, np.random.default_rng(seed))
+
+
+def migrate(populations, fitnesses, migration_size):
+    """
+    Ring migration: each island's best individuals replace the worst
+    individuals of the next island.
+    """
+    islands = len(populations)
+    if islands < 2 or migration_size <= 0:
+        return
+    migrants = [populations[k][np.argsort(fitnesses[k])[:migration_size]].copy() for k in range(islands)]
+    for k in range(islands):
+        target = (k + 1) % islands
+        worst = np.argsort(fitnesses[target])[-migration_size:]
+        populations[target][worst] = migrants[k]
+        fitnesses[target][worst] = np.sort(fitnesses[k])[:migration_size]
+
+
+def island_count(islands, population_size, size):
+    """
+    Clamps the island count to MAX_ISLANDS and to the islands whose int32
+    populations fit in MAX_POPULATION_BYTES, keeping at least one.
+
+    Raises:
+        ValueError: If ``islands`` is below 1.
+    """
+    if islands < 1:
+        raise ValueError('islands must be at least 1')
+    fitting = MAX_POPULATION_BYTES // max(population_size * size * np.dtype(np.int32).itemsize, 1)
+    return max(1, min(islands, MAX_ISLANDS, fitting))
+
+
+def island_genetic(orders, islands=4, workers=None, population_size=30, generations=30,
+                   mutation_rate=0.2, migration_interval=10, migration_size=2, seed=None, callback=None):
+    """
+    Island-model GA: independent populations evolve in a process pool and
+    exchange their best individuals every ``migration_interval`` generations.
+
+    Order arrays and all populations live in shared memory, so workers
+    evolve their island in place and only fitness summaries are pickled.
+
+    Args:
+        orders (pd.DataFrame): Order table or prediction frame.
+        islands (int): Number of independent populations, clamped by
+            island_count.
+        workers (int, optional): Islands evolved at once, clamped to [1,
+            cpu count]; defaults to all cores. With 1 worker the islands run
+            in this process, otherwise at most ``workers`` at a time in the
+            shared one-per-core pool.
+        migration_interval (int): Generations between migrations.
+        migration_size (int): Individuals sent to the next island.
+        seed (int, optional): Seed for reproducible runs.
+        callback (callable, optional): Called as callback(generation,
+            best_score) with the global best after each migration epoch;
+            returning True stops before the next epoch.
+
+    Returns:
+        tuple: (best_order, best_score, per-island best score per generation)
+
+    Raises:
+        ValueError: If ``islands`` is below 1.
+    """
+    islands = island_count(islands, population_size, len(orders))
+    if len(orders) < 2:
+        return list(orders.index), fitness(list(orders.index), orders), []
+
+    scorer = OrderScorer.from_orders(orders)
+    size = len(orders)
+    island_seeds = np.random.SeedSequence(seed).spawn(islands)
+    migration_size = min(migration_size, population_size)
+    migration_interval = max(1, migration_interval)
+
+    order_arrays = share_scorer(scorer)
+    populations = SharedArray.create((islands, population_size, size), np.int32)
+    bests = SharedArray.create((islands, size), np.int32)
+    try:
+        for k in range(islands):
+            populations.array[k] = create_population(size, population_size, np.random.default_rng(island_seeds[k].spawn(1)[0]))
+
+        order_specs = {key: array.spec for key, array in order_arrays.items()}
+        workers = pool_workers(workers)
+        pool = get_pool() if workers > 1 else None
+        best_fitness = np.full(islands, np.inf)
+        history = [[] for _ in range(islands)]
+
+        done = 0
+        while done < generations:
+            epoch = min(migration_interval, generations - done)
+            seeds = [island_seeds[k].spawn(1)[0] for k in range(islands)]
+            if pool is None:
+                results = [_evolve(scorer, populations.array[k], bests.array[k], float(best_fitness[k]),
+                                   epoch, mutation_rate, np.random.default_rng(seeds[k])) for k in range(islands)]
+            else:
+                calls = [(_run_island, order_specs, populations.spec, bests.spec, k,
+                          float(best_fitness[k]), epoch, mutation_rate, seeds[k]) for k in range(islands)]
+                results = run_bounded(pool, calls, workers)
+
+            fitnesses = []
+            for k, (island_best, island_fitnesses, island_history) in enumerate(results):
+                best_fitness[k] = island_best
+                history[k].extend(island_history)
+                fitnesses.append(island_fitnesses)
+            stop = False
+            if callback is not None:
+                for g in range(done, done + epoch):
+                    stop = callback(g + 1, min(h[g] for h in history)) or stop
+            done += epoch
+            if stop:
+                break
+            if done < generations:
+                migrate(populations.array, fitnesses, migration_size)
+
+        winner = int(np.argmin(best_fitness))
+        best_individual = bests.array[winner].copy()
+        return orders.index[best_individual].tolist(), float(best_fitness[winner]), history
+    finally:
+        for array in (*order_arrays.values(), populations, bests):
+            array.close()
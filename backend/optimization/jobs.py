@@ -0,0 +1,136 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+
+
+class OptimizationJob:
+    """
+    One background optimizer run. The optimizer reports progress through
+    ``progress`` (its callback), which also tells it to stop once the job
+    is cancelled or its time budget runs out.
+    """
+
+    def __init__(self, method, time_limit=None):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.time_limit = time_limit
+        self.status = QUEUED
+        self.score_history = []
+        self.best_score = None
+        self.result = None
+        self.error = None
+        self.stopped_by = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.updated = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, CANCELLED, FAILED)
+
+    def progress(self, iteration, best_score):
+        with self.updated:
+            self.score_history.append(float(best_score))
+            self.best_score = float(best_score)
+            self.updated.notify_all()
+
+        if self.cancel_event.is_set():
+            self.stopped_by = 'cancel'
+            return True
+        if self.time_limit is not None and time.time() - self.started_at >= self.time_limit:
+            self.stopped_by = 'time_limit'
+            return True
+        return False
+
+    def wait(self, seen, timeout):
+        """Blocks until there is history past ``seen`` or the job ends."""
+        with self.updated:
+            self.updated.wait_for(lambda: len(self.score_history) > seen or self.finished, timeout)
+
+    def to_dict(self, since=0):
+        data = {
+            'job_id': self.id,
+            'method': self.method,
+            'status': self.status,
+            'bestScore': self.best_score,
+            'scoreHistory': self.score_history[since:],
+            'historyOffset': since,
+            'historyLength': len(self.score_history),
+            'stoppedBy': self.stopped_by,
+            'elapsed': (self.finished_at or time.time()) - (self.started_at or time.time()),
+        }
+        if self.result is not None:
+            data['result'] = self.result
+        if self.error is not None:
+            data['error'] = self.error
+        return data
+
+
+class JobManager:
+    """
+    Runs optimizer jobs on a small thread pool so requests return a job id
+    right away. Finished jobs are kept (up to ``keep``) for polling.
+    """
+
+    def __init__(self, max_workers=2, keep=100):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='optimize')
+        self.keep = keep
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, method, run, time_limit=None):
+        """
+        Args:
+            method (str): Optimizer name, for display.
+            run (callable): run(progress) -> JSON-serializable result, where
+                progress is the optimizer callback.
+            time_limit (float, optional): Seconds before the job is stopped.
+        """
+        job = OptimizationJob(method, time_limit)
+        with self.lock:
+            self.jobs[job.id] = job
+            while len(self.jobs) > self.keep:
+                oldest = next(iter(self.jobs.values()))
+                if not oldest.finished:
+                    break
+                self.jobs.popitem(last=False)
+        self.executor.submit(self._run, job, run)
+        return job
+
+    def _run(self, job, run):
+        if job.cancel_event.is_set():
+            self._finish(job, CANCELLED)
+            return
+        job.started_at = time.time()
+        job.status = RUNNING
+        try:
+            job.result = run(job.progress)
+            self._finish(job, CANCELLED if job.stopped_by == 'cancel' else DONE)
+        except Exception as e:
+            job.error = str(e)
+            self._finish(job, FAILED)
+
+    def _finish(self, job, status):
+        with job.updated:
+            job.status = status
+            job.finished_at = time.time()
+            job.updated.notify_all()
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is not None:
+            job.cancel_event.set()
+        return job
@@ -0,0 +1,141 @@
+import time
+
+import numpy as np
+
+from optimization.exact import exact_sequence
+from optimization.scoring import OrderScorer, fitness
+from optimization.shared import SharedArray, get_pool, pool_workers, run_bounded, share_scorer
+from optimization.tabu import generate_initial_solution, search
+
+
+def _start(scorer, kind, rng):
+    if kind == 'sorted':
+        # 線性目標用 WSPT 排序，期望延遲則以風險由高到低排序作為起點
+        if scorer.is_linear:
+            return exact_sequence(scorer)
+        return np.argsort(-scorer.values, kind='stable')
+    return generate_initial_solution(np.arange(len(scorer.values)), rng)
+
+
+def _run_start(scorer, kind, seed, max_iter, tabu_size, neighbor_size, deadline, callback=None):
+    rng = np.random.default_rng(seed)
+    return search(scorer, _start(scorer, kind, rng), rng, max_iter, tabu_size, neighbor_size, deadline, callback)
+
+
+def _run_shared_start(order_specs, kind, seed, max_iter, tabu_size, neighbor_size, deadline):
+    """Runs one tabu start inside a worker process."""
+    shared = {key: SharedArray.attach(spec) for key, spec in order_specs.items()}
+    try:
+        return _search_attached(shared, kind, seed, max_iter, tabu_size, neighbor_size, deadline)
+    finally:
+        for array in shared.values():
+            array.close()
+
+
+def _search_attached(shared, kind, seed, max_iter, tabu_size, neighbor_size, deadline):
+    durations = shared['durations'].array if 'durations' in shared else None
+    due_dates = shared['due_dates'].array if 'due_dates' in shared else None
+    scorer = OrderScorer(shared['values'].array, durations, due_dates)
+    return _run_start(scorer, kind, seed, max_iter, tabu_size, neighbor_size, deadline)
+
+
+def multi_start_tabu(orders, starts=4, workers=None, seed=None, time_limit=None,
+                     max_iter=100, tabu_size=20, neighbor_size=30, callback=None):
+    """
+    Runs ``starts`` independent tabu searches in a process pool and keeps
+    the best. The first start is the risk-sorted sequence, the rest are
+    random restarts.
+
+    Every start gets its own integer seed derived from ``seed``; re-running
+    tabu_search with that seed (and, for the first start, the sorted
+    initial solution) reproduces it. Results are fully reproducible when
+    no time_limit cuts runs short.
+
+    Args:
+        orders (pd.DataFrame): Order table or prediction frame.
+        starts (int): Number of tabu runs.
+        workers (int, optional): Starts run at once, clamped to [1, cpu
+            count]; defaults to all cores. With 1 worker the starts run in
+            this process, otherwise at most ``workers`` at a time in the
+            shared one-per-core pool.
+        seed (int, optional): Non-negative base seed; a 32-bit one is
+            drawn from OS entropy if omitted and returned so the run can be
+            repeated.
+        time_limit (float, optional): Wall-clock budget in seconds for the
+            whole call.
+        callback (callable, optional): Called as callback(step, best_score).
+            In-process runs report every tabu iteration; pooled runs report
+            each finished start. Returning True stops the remaining starts.
+
+    Returns:
+        tuple: (best_order, best_score, run info dict)
+
+    Raises:
+        ValueError: If ``starts`` is below 1 or ``seed`` is negative.
+    """
+    if starts < 1:
+        raise ValueError('starts must be at least 1')
+    if seed is None:
+        # 32 位元的 seed 在 JavaScript 前端也能原樣送回
+        seed = int(np.random.SeedSequence().generate_state(1)[0])
+    elif seed < 0:
+        raise ValueError('seed must be non-negative')
+    deadline = None if time_limit is None else time.time() + time_limit
+    sequence = np.random.SeedSequence(seed)
+    info = {'seed': seed, 'runs': []}
+    if len(orders) < 2:
+        return list(orders.index), fitness(list(orders.index), orders), info
+
+    scorer = OrderScorer.from_orders(orders)
+    seeds = sequence.generate_state(starts).tolist()
+    kinds = ['sorted'] + ['random'] * (starts - 1)
+    params = (max_iter, tabu_size, neighbor_size, deadline)
+
+    results = [None] * starts
+    workers = pool_workers(workers)
+    if workers == 1:
+        best = float('inf')
+        steps = 0
+        stopped = False
+
+        def report(iteration, best_score):
+            nonlocal steps, stopped
+            steps += 1
+            stopped = bool(callback(steps, min(best, best_score)))
+            return stopped
+
+        for k, (kind, s) in enumerate(zip(kinds, seeds)):
+            results[k] = _run_start(scorer, kind, s, *params, report if callback else None)
+            best = min(best, results[k][1])
+            if stopped:
+                break
+    else:
+        order_arrays = share_scorer(scorer)
+        try:
+            order_specs = {key: array.spec for key, array in order_arrays.items()}
+            best = float('inf')
+            steps = 0
+            stopped = False
+
+            def finished(k, result):
+                nonlocal best, steps, stopped
+                if not stopped:
+                    best = min(best, result[1])
+                    steps += 1
+                    stopped = callback is not None and bool(callback(steps, best))
+                # 停止後不再送出新的 start，已在執行的會跑到結束或時限
+                return stopped
+
+            calls = [(_run_shared_start, order_specs, kind, s, *params) for kind, s in zip(kinds, seeds)]
+            results = run_bounded(get_pool(), calls, workers, finished)
+        finally:
+            for array in order_arrays.values():
+                array.close()
+
+    for kind, s, result in zip(kinds, seeds, results):
+        if result is not None:
+            info['runs'].append({'start': kind, 'seed': s, 'score': result[1], 'iterations': result[2]})
+
+    finished = [k for k in range(starts) if results[k] is not None]
+    winner = min(finished, key=lambda k: results[k][1])
+    return orders.index[results[winner][0]].tolist(), results[winner][1], info
@@ -0,0 +1,139 @@
+import errno
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from utils.metrics import metrics
+from utils.preprocess import read_upload
+from utils.storage import find_frame, frame_columns, frame_path, read_frame
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLASSIFICATION_DIR = os.path.join(BACKEND_DIR, 'Classification_prediction')
+REGRESSION_DIR = os.path.join(BACKEND_DIR, 'Regression_prediction')
+SCORES_DIR = os.path.join(BACKEND_DIR, 'Predictions')
+
+PREDICTION_DIRS = {'risk': CLASSIFICATION_DIR, 'days': REGRESSION_DIR}
+
+
+def build_order_table(risk_df, days_df, raw_df=None):
+    """
+    Joins the classification risk and the regression shipping days into one
+    row per 'Order Id' for the scheduling objective.
+
+    An order ships when its slowest item ships and is late if any item is,
+    so items are aggregated with max.
+
+    Args:
+        risk_df (pd.DataFrame): Classification output ('Order Id', 'PredictedValue').
+        days_df (pd.DataFrame): Regression output ('Order Id', 'PredictedValue').
+        raw_df (pd.DataFrame, optional): Uploaded orders; when given, their
+            'Days for shipment (scheduled)' becomes the due date.
+
+    Returns:
+        pd.DataFrame: Columns 'Order Id', 'risk', 'days' and optionally 'due'.
+    """
+    risk = risk_df.groupby('Order Id', sort=False)['PredictedValue'].max().rename('risk')
+    days = days_df.groupby('Order Id', sort=False)['PredictedValue'].max().rename('days')
+    table = pd.concat([risk, days], axis=1, join='inner')
+
+    if raw_df is not None:
+        due = raw_df.groupby('Order Id', sort=False)['Days for shipment (scheduled)'].min().rename('due')
+        table = table.join(due, how='inner')
+
+    # 工期不可為負，否則完成時間會倒退
+    table['days'] = table['days'].clip(lower=0)
+    return table.astype('float64').rename_axis('Order Id').reset_index()
+
+
+def prediction_paths(file_name, kinds=('risk', 'days')):
+    """
+    Stored predictions of an upload per kind ('risk', 'days'). The fused
+    /score artifact is used when it is at least as new as the separate
+    /prediction and /regression outputs.
+    """
+    separate = {kind: find_frame(PREDICTION_DIRS[kind], f"{file_name}_prediction") for kind in kinds}
+    fused = find_frame(SCORES_DIR, f"{file_name}_scores")
+    if fused is not None and all(path is None or os.path.getmtime(path) <= os.path.getmtime(fused)
+                                 for path in separate.values()):
+        return {kind: fused for kind in kinds}
+
+    for kind, path in separate.items():
+        if path is None:
+            missing = frame_path(PREDICTION_DIRS[kind], f"{file_name}_prediction")
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), missing)
+    return separate
+
+
+def load_predictions(file_name, kinds=('risk', 'days')):
+    """
+    Item-level predictions of an upload as {kind: DataFrame} with
+    'Order Id' and 'PredictedValue' columns, plus 'Order Item Id' when the
+    stored predictions have it.
+    """
+    frames = {}
+    for kind, path in prediction_paths(file_name, kinds).items():
+        column = kind if os.path.dirname(path) == SCORES_DIR else 'PredictedValue'
+        stored = frame_columns(path)
+        ids = [name for name in ('Order Id', 'Order Item Id') if name in stored]
+        frames[kind] = read_frame(path, ids + [column]).rename(columns={column: 'PredictedValue'})
+    return frames
+
+
+def load_order_table(file_name, raw_path=None):
+    """Loads the order table for an upload from its saved predictions."""
+    predictions = load_predictions(file_name)
+    risk_df, days_df = predictions['risk'], predictions['days']
+    raw_df = None
+    if raw_path is not None:
+        raw_df = read_upload(raw_path, usecols=['Order Id', 'Days for shipment (scheduled)'])
+    with metrics.stage('merge', rows=len(risk_df)):
+        return build_order_table(risk_df, days_df, raw_df)
+
+
+def _signature(paths):
+    signature = []
+    for path in paths:
+        stat = os.stat(path)
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+class OrderStore:
+    """
+    Caches order tables per upload so repeated optimization calls on the
+    same batch skip re-parsing and re-joining the prediction files.
+
+    Entries are keyed by file name and validated against the source files'
+    mtime and size, so re-running /prediction or /regression invalidates
+    them automatically. At most ``max_entries`` batches are kept (LRU).
+    """
+
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def source_paths(self, file_name, raw_path=None):
+        paths = list(prediction_paths(file_name).values())
+        if raw_path is not None:
+            paths.append(raw_path)
+        return paths
+
+    def get(self, file_name, raw_path=None):
+        key = (file_name, raw_path)
+        signature = _signature(self.source_paths(file_name, raw_path))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self.entries.move_to_end(key)
+                return entry[1]
+
+        table = load_order_table(file_name, raw_path)
+        with self.lock:
+            self.entries[key] = (signature, table)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return table
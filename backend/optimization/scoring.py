@@ -0,0 +1,185 @@
+import numpy as np
+
+
+class OrderScorer:
+    """
+    Shared scoring engine for the order-sequencing optimizers.
+
+    Orders are processed one after another; order j finishes at C_j, the
+    running sum of the processing times ('days') up to and including it.
+    The objective is the weighted completion time sum(risk * C), or the
+    expected tardiness sum(risk * max(0, C - due)) when due dates are given.
+    Without real durations every order takes one unit, which reduces to the
+    original position penalty sum(risk * (position + 1)).
+
+    Values are pulled out of the DataFrame once, so a sequence is scored as
+    an array of row positions without any pandas label lookups.
+    """
+
+    def __init__(self, values, durations=None, due_dates=None):
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        self.unit_durations = durations is None
+        if self.unit_durations:
+            self.durations = np.ones(len(self.values))
+        else:
+            self.durations = np.ascontiguousarray(durations, dtype=np.float64)
+        self.due_dates = None if due_dates is None else np.ascontiguousarray(due_dates, dtype=np.float64)
+        self.penalties = np.arange(1, len(self.values) + 1, dtype=np.float64)
+
+    @classmethod
+    def from_orders(cls, orders):
+        """
+        Builds a scorer from an order table (see optimization.orders) or
+        from a plain prediction frame with a 'PredictedValue' column.
+        """
+        weights = orders['risk'] if 'risk' in orders.columns else orders['PredictedValue']
+        durations = orders['days'].to_numpy() if 'days' in orders.columns else None
+        due_dates = orders['due'].to_numpy() if 'due' in orders.columns else None
+        return cls(weights.to_numpy(), durations, due_dates)
+
+    @property
+    def is_linear(self):
+        """Weighted completion time, which has an exact sort-based optimum."""
+        return self.due_dates is None
+
+    @property
+    def closed_form_swaps(self):
+        """Unit durations without due dates: swap deltas need no state."""
+        return self.unit_durations and self.is_linear
+
+    def positions(self, orders, order_indices):
+        """Translates DataFrame index labels into row positions."""
+        return orders.index.get_indexer(order_indices)
+
+    def score(self, sequence):
+        sequence = np.asarray(sequence)
+        return float(self.score_population(sequence[np.newaxis, :])[0])
+
+    def score_population(self, population):
+        """
+        Scores a whole population at once.
+
+        Args:
+            population: 2D array-like, one sequence of row positions per row.
+
+        Returns:
+            np.ndarray: The score of every sequence.
+        """
+        population = np.asarray(population)
+        if self.closed_form_swaps:
+            return self.values[population] @ self.penalties[:population.shape[1]]
+
+        completion = np.cumsum(self.durations[population], axis=1)
+        if not self.is_linear:
+            completion = np.maximum(completion - self.due_dates[population], 0.0)
+        return np.einsum('ij,ij->i', self.values[population], completion)
+
+    def swap_delta(self, sequence, i, j):
+        """Score change from swapping positions i and j."""
+        return float(self.swap_deltas(sequence, np.array([i]), np.array([j]))[0])
+
+    def swap_deltas(self, sequence, i, j):
+        """
+        Vectorized swap_delta for arrays of position pairs. O(1) per move
+        with unit durations; otherwise keep an evaluator() across moves.
+        """
+        if not self.closed_form_swaps:
+            return self.evaluator(sequence).swap_deltas(i, j)
+        sequence = np.asarray(sequence)
+        i = np.asarray(i)
+        j = np.asarray(j)
+        return (self.values[sequence[j]] - self.values[sequence[i]]) * (i - j)
+
+    def evaluator(self, sequence):
+        return IncrementalEvaluator(self, sequence)
+
+
+class IncrementalEvaluator:
+    """
+    Keeps running completion times and weight prefix sums for one sequence
+    so swap moves can be scored without re-scoring the whole sequence.
+
+    For weighted completion time a swap of positions i < j moves a and b
+    and shifts every order in between by (p_b - p_a), so its delta is
+    O(1) from the prefix sums. Expected tardiness is not linear in the
+    shift and costs O(j - i) per move.
+
+    Applying an accepted swap is O(1) only with unit durations. Otherwise
+    the completion times and prefix sums of positions i..j are updated,
+    which is O(j - i) and so O(n) in the worst case for the random-distance
+    swaps tabu search draws; only the scoring of rejected neighbors is
+    independent of n.
+    """
+
+    def __init__(self, scorer, sequence):
+        self.scorer = scorer
+        self.sequence = np.array(sequence)
+        if not scorer.closed_form_swaps:
+            self._refresh()
+
+    def _refresh(self):
+        self.completion = np.cumsum(self.scorer.durations[self.sequence])
+        self.weight_prefix = np.concatenate(([0.0], np.cumsum(self.scorer.values[self.sequence])))
+
+    @property
+    def score(self):
+        return self.scorer.score(self.sequence)
+
+    def swap_deltas(self, i, j):
+        scorer = self.scorer
+        if scorer.closed_form_swaps:
+            return scorer.swap_deltas(self.sequence, i, j)
+
+        i, j = np.minimum(i, j), np.maximum(i, j)
+        a = self.sequence[i]
+        b = self.sequence[j]
+        w_a, w_b = scorer.values[a], scorer.values[b]
+        p_a, p_b = scorer.durations[a], scorer.durations[b]
+
+        if scorer.is_linear:
+            start = self.completion[i] - p_a
+            end = self.completion[j]
+            middle = self.weight_prefix[j] - self.weight_prefix[i + 1]
+            return w_b * (start + p_b - end) + w_a * (end - start - p_a) + (p_b - p_a) * middle
+
+        deltas = np.empty(len(i))
+        for k in range(len(i)):
+            deltas[k] = self._tardiness_delta(i[k], j[k])
+        return deltas
+
+    def _tardiness_delta(self, i, j):
+        scorer = self.scorer
+        seq = self.sequence
+        a, b = seq[i], seq[j]
+        shift = scorer.durations[b] - scorer.durations[a]
+        start = self.completion[i] - scorer.durations[a]
+        end = self.completion[j]
+
+        def tardiness(orders, completion):
+            return scorer.values[orders] * np.maximum(completion - scorer.due_dates[orders], 0.0)
+
+        middle = seq[i + 1:j]
+        old_middle = self.completion[i + 1:j]
+        delta = np.sum(tardiness(middle, old_middle + shift) - tardiness(middle, old_middle))
+        delta += tardiness(b, start + scorer.durations[b]) - tardiness(b, end)
+        delta += tardiness(a, end) - tardiness(a, self.completion[i])
+        return delta
+
+    def apply_swap(self, i, j):
+        i, j = min(i, j), max(i, j)
+        seq = self.sequence
+        a, b = seq[i], seq[j]
+        seq[i], seq[j] = b, a
+        # 單位工期的 delta 為封閉解，不需要維護前綴和
+        if self.scorer.closed_form_swaps:
+            return
+        # only positions i..j move: completions shift by (p_b - p_a) and the
+        # weight prefix by (w_b - w_a), so the update is O(j - i), up to O(n)
+        scorer = self.scorer
+        self.completion[i:j] += scorer.durations[b] - scorer.durations[a]
+        self.weight_prefix[i + 1:j + 1] += scorer.values[b] - scorer.values[a]
+
+
+def fitness(individual, orders):
+    scorer = OrderScorer.from_orders(orders)
+    return scorer.score(scorer.positions(orders, individual))
@@ -0,0 +1,133 @@
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+
+# The one process pool shared by all optimizer calls
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+class SharedArray:
+    """
+    A NumPy array backed by a named shared-memory block.
+
+    The parent creates it once; worker processes attach by ``spec`` (name,
+    shape, dtype) and read or write the same memory without pickling the
+    data into every task.
+    """
+
+    def __init__(self, shm, shape, dtype, owner):
+        self.shm = shm
+        self.owner = owner
+        self.array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+    @classmethod
+    def create(cls, shape, dtype):
+        dtype = np.dtype(dtype)
+        size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+        return cls(shared_memory.SharedMemory(create=True, size=size), shape, dtype, owner=True)
+
+    @classmethod
+    def copy_of(cls, array):
+        array = np.ascontiguousarray(array)
+        shared = cls.create(array.shape, array.dtype)
+        shared.array[...] = array
+        return shared
+
+    @classmethod
+    def attach(cls, spec):
+        name, shape, dtype = spec
+        return cls(shared_memory.SharedMemory(name=name), shape, dtype, owner=False)
+
+    @property
+    def spec(self):
+        return self.shm.name, self.array.shape, self.array.dtype.str
+
+    def close(self):
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def pool_workers(workers=None):
+    """Process count for a request: ``workers`` clamped to [1, cpu count], all cores when omitted."""
+    cpus = os.cpu_count() or 1
+    return cpus if not workers else min(max(int(workers), 1), cpus)
+
+
+def get_pool():
+    """
+    The process pool reused across requests, one process per core. There
+    is only ever this one pool, so worker counts chosen by clients cannot
+    pile up processes; run_bounded caps how many of them one call uses.
+
+    Workers come from a forkserver rather than a fork of this process,
+    which by then runs request, job and XGBoost threads.
+    """
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(max_workers=pool_workers(), mp_context=get_context('forkserver'))
+        return _POOL
+
+
+def run_bounded(pool, calls, limit, on_result=None):
+    """
+    Runs ``calls`` ((fn, *args) tuples) in ``pool`` with at most ``limit``
+    of them submitted at once, so one request cannot occupy more processes
+    than it asked for.
+
+    Args:
+        pool (Executor): Pool to submit to.
+        calls (list): (fn, *args) tuples.
+        limit (int): Calls in flight at any time.
+        on_result (callable, optional): Called as on_result(index, result)
+            as each call finishes; once it returns True no further calls are
+            submitted, and the ones already running are still awaited.
+
+    Returns:
+        list: Result per call in ``calls`` order, None for calls never submitted.
+    """
+    results = [None] * len(calls)
+    queued = iter(enumerate(calls))
+    running = {}
+    stopped = False
+
+    def submit_next():
+        queued_call = next(queued, None)
+        if queued_call is not None:
+            k, (fn, *args) = queued_call
+            running[pool.submit(fn, *args)] = k
+
+    for _ in range(max(1, limit)):
+        submit_next()
+    while running:
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            k = running.pop(future)
+            results[k] = future.result()
+            if on_result is not None and on_result(k, results[k]):
+                stopped = True
+            if not stopped:
+                submit_next()
+    return results
+
+
+def share_scorer(scorer):
+    """Copies a scorer's order arrays into shared memory."""
+    arrays = {'values': SharedArray.copy_of(scorer.values)}
+    if not scorer.unit_durations:
+        arrays['durations'] = SharedArray.copy_of(scorer.durations)
+    if scorer.due_dates is not None:
+        arrays['due_dates'] = SharedArray.copy_of(scorer.due_dates)
+    return arrays
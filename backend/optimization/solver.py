@@ -0,0 +1,51 @@
+from optimization.exact import exact_search
+from optimization.ga import genetic
+from optimization.scoring import OrderScorer
+from optimization.tabu import tabu_search
+
+METHODS = ('auto', 'exact', 'tabu', 'ga')
+
+
+def has_exact_solution(orders):
+    """
+    Whether the orders' objective has a known exact solution.
+
+    Weighted completion time (and the unit-day position penalty) is solved
+    by sorting; expected tardiness against due dates is NP-hard and needs
+    the metaheuristics.
+    """
+    return OrderScorer.from_orders(orders).is_linear
+
+
+def solve(orders, method='auto', callback=None, **kwargs):
+    """
+    Sequences orders with the requested optimizer.
+
+    Args:
+        orders (pd.DataFrame): An order table (see optimization.orders) or
+            a prediction frame with a 'PredictedValue' column.
+        method (str): 'exact', 'tabu', 'ga', or 'auto' to use the exact
+            solver whenever the objective allows it and tabu otherwise.
+        callback (callable, optional): Progress callback(step, best_score);
+            returning True stops the optimizer early.
+        **kwargs: Passed through to the chosen optimizer.
+
+    Returns:
+        tuple: (best_order, best_score, method actually used)
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}', expected one of {METHODS}")
+
+    if method == 'auto':
+        method = 'exact' if has_exact_solution(orders) else 'tabu'
+
+    if method == 'exact':
+        best_order, best_score = exact_search(orders)
+        if callback is not None:
+            callback(1, best_score)
+    elif method == 'tabu':
+        best_order, best_score = tabu_search(orders, list(orders.index), callback=callback, **kwargs)
+    else:
+        best_order, best_score = genetic(orders, callback=callback, **kwargs)
+
+    return best_order, best_score, method
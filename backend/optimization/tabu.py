@@ -1,60 +1,143 @@
+import time
+
 import numpy as np
 
-def fitness(individual, orders):
-    score = 0
-    current_time = 0
-    for position, idx in enumerate(individual):
-        predicted_risk = orders.loc[idx, 'PredictedValue']
-        shipping_days = 1
-        # 排序越後面，懲罰越高
-        delay_penalty = predicted_risk * (position + 1)
+from optimization.scoring import OrderScorer, fitness
+
+
+class TabuMemory:
+    """
+    Move-attribute tabu list: a swapped pair of orders stays tabu for the
+    next ``tenure`` moves.
+
+    Pairs live in a fixed-size ring buffer for expiry and in a set for O(1)
+    membership, so checking a neighbor no longer compares whole solutions.
+    """
+
+    def __init__(self, tenure):
+        self.tenure = tenure
+        self.ring = [None] * tenure
+        self.head = 0
+        self.active = {}
 
-        score += delay_penalty
-        current_time += shipping_days
+    @staticmethod
+    def key(a, b):
+        return (a, b) if a < b else (b, a)
 
-    return score
+    def __contains__(self, pair):
+        return self.key(*pair) in self.active
 
-def generate_initial_solution(order_indices):
-    initial = order_indices.copy()
-    np.random.shuffle(initial)
+    def add(self, a, b):
+        if self.tenure <= 0:
+            return
+        expired = self.ring[self.head]
+        if expired is not None:
+            # 同一組交換可能在期限內出現兩次，用計數避免提早解禁
+            self.active[expired] -= 1
+            if not self.active[expired]:
+                del self.active[expired]
+        pair = self.key(a, b)
+        self.ring[self.head] = pair
+        self.active[pair] = self.active.get(pair, 0) + 1
+        self.head = (self.head + 1) % self.tenure
+
+
+def generate_initial_solution(order_indices, rng=None):
+    rng = rng or np.random.default_rng()
+    initial = np.array(order_indices)
+    rng.shuffle(initial)
     return initial
 
-def generate_neighbors(solution, neighbor_size=30):
-    neighbors = []
-    for _ in range(neighbor_size):
-        neighbor = solution.copy()
-        i, j = np.random.choice(len(neighbor), 2, replace=False)
-        neighbor[i], neighbor[j] = neighbor[j], neighbor[i]
-        neighbors.append(neighbor)
-    return neighbors
-
-def tabu_search(orders, order_indices, max_iter=100, tabu_size=20, neighbor_size=30):
-    best_solution = generate_initial_solution(order_indices)
-    best_fitness = fitness(best_solution, orders)
-    current_solution = best_solution.copy()
-    tabu_list = []
-
-    for _ in range(max_iter):
-        neighbors = generate_neighbors(current_solution, neighbor_size)
-        candidate = None
-        candidate_fitness = None
-        for neighbor in neighbors:
-            if neighbor not in tabu_list:
-                f = fitness(neighbor, orders)
-                if candidate is None or f < candidate_fitness:
-                    candidate = neighbor
-                    candidate_fitness = f
-
-        if candidate is None:
+def generate_moves(size, neighbor_size=30, rng=None):
+    # 每個鄰居以一組 (i, j) 交換表示，不必複製整個解
+    rng = rng or np.random.default_rng()
+    i = rng.integers(0, size, neighbor_size)
+    j = (i + rng.integers(1, size, neighbor_size)) % size
+    return i, j
+
+def search(scorer, initial_solution, rng, max_iter=100, tabu_size=20, neighbor_size=30, deadline=None,
+           callback=None):
+    """
+    Tabu search over row positions. ``callback(iteration, best_score)`` is
+    called after every iteration; returning True stops the search.
+
+    Scoring the neighbors costs O(neighbor_size) per iteration with unit
+    durations or without due dates; accepting a swap is O(j - i) with real
+    durations (see IncrementalEvaluator). The best sequence is not copied
+    on every improvement: the swaps made since the last best are replayed
+    onto it, each at most once.
+
+    Returns:
+        tuple: (best sequence, best score, iterations run)
+    """
+    best_solution = np.array(initial_solution)
+    best_fitness = scorer.score(best_solution)
+    current = scorer.evaluator(best_solution)
+    current_fitness = best_fitness
+    tabu = TabuMemory(tabu_size)
+    # 自上次最佳解以來的交換，找到更好的解時才套用到 best_solution
+    since_best = []
+
+    iteration = 0
+    while iteration < max_iter:
+        if deadline is not None and time.time() >= deadline:
             break
+        iteration += 1
+        move_i, move_j = generate_moves(len(current.sequence), neighbor_size, rng)
+        deltas = current.swap_deltas(move_i, move_j)
+        order_a = current.sequence[move_i].tolist()
+        order_b = current.sequence[move_j].tolist()
+
+        # aspiration: a tabu move is still allowed if it beats the best so far
+        is_tabu = np.fromiter((pair in tabu for pair in zip(order_a, order_b)), dtype=bool, count=len(deltas))
+        admissible = ~is_tabu | (current_fitness + deltas < best_fitness)
+        if not admissible.any():
+            break
+
+        move = np.flatnonzero(admissible)[np.argmin(deltas[admissible])]
+        i, j = move_i[move], move_j[move]
+        current.apply_swap(i, j)
+        current_fitness += deltas[move]
+        tabu.add(order_a[move], order_b[move])
+        since_best.append((i, j))
+
+        if current_fitness < best_fitness:
+            for i, j in since_best:
+                best_solution[i], best_solution[j] = best_solution[j], best_solution[i]
+            since_best.clear()
+            best_fitness = current_fitness
+        if callback is not None and callback(iteration, best_fitness):
+            break
+
+    return best_solution, scorer.score(best_solution), iteration
+
+def tabu_search(orders, order_indices, max_iter=100, tabu_size=20, neighbor_size=30,
+                seed=None, initial_solution=None, time_limit=None, callback=None):
+    """
+    Args:
+        orders (pd.DataFrame): Order table or prediction frame.
+        order_indices (list): Index labels of the orders to sequence.
+        seed (int, optional): Seeds the random start and moves so a run
+            can be reproduced.
+        initial_solution (list, optional): Starting sequence of index
+            labels instead of a random shuffle of order_indices.
+        time_limit (float, optional): Wall-clock budget in seconds.
+        callback (callable, optional): Called as callback(iteration,
+            best_score) after every iteration; returning True stops early.
 
-        current_solution = candidate
-        if candidate_fitness < best_fitness:
-            best_solution = candidate
-            best_fitness = candidate_fitness
+    Returns:
+        tuple: (best_order, best_score)
+    """
+    if len(order_indices) < 2:
+        return list(order_indices), fitness(order_indices, orders)
 
-        tabu_list.append(candidate)
-        if len(tabu_list) > tabu_size:
-            tabu_list.pop(0)
+    rng = np.random.default_rng(seed)
+    scorer = OrderScorer.from_orders(orders)
+    if initial_solution is None:
+        start = generate_initial_solution(scorer.positions(orders, order_indices), rng)
+    else:
+        start = scorer.positions(orders, initial_solution)
+    deadline = None if time_limit is None else time.time() + time_limit
 
-    return best_solution, best_fitness
\ No newline at end of file
+    best_solution, best_fitness, _ = search(scorer, start, rng, max_iter, tabu_size, neighbor_size, deadline, callback)
+    return orders.index[best_solution].tolist(), best_fitness
@@ -0,0 +1,114 @@
+import os
+import sys
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from utils.models import MODEL_PATHS  # noqa: E402
+from utils.preprocess import OrderPreprocessor, read_upload  # noqa: E402
+
+SAMPLE_CSV = os.path.join(BACKEND_DIR, 'test', 'df_trying_subset.csv')
+
+
+def order_table(count, seed=0, due=False):
+    """Random order table as build_order_table returns it: 'Order Id', 'risk', 'days' and optionally 'due'."""
+    rng = np.random.default_rng(seed)
+    table = pd.DataFrame({
+        'Order Id': np.arange(1, count + 1, dtype=np.float64),
+        'risk': rng.random(count),
+        'days': rng.integers(1, 7, count).astype(np.float64),
+    })
+    if due:
+        table['due'] = rng.integers(1, 2 * count, count).astype(np.float64)
+    return table
+
+
+def _load(name):
+    with warnings.catch_warnings():
+        # 模型以較舊的 xgboost 存檔，載入時的版本警告與測試無關
+        warnings.simplefilter('ignore')
+        return joblib.load(MODEL_PATHS[name])
+
+
+@pytest.fixture(scope='session')
+def encoder():
+    return _load('encoder')
+
+
+@pytest.fixture(scope='session')
+def classifier():
+    return _load('classification')
+
+
+@pytest.fixture(scope='session')
+def regressor():
+    return _load('regression')
+
+
+@pytest.fixture(scope='session')
+def preprocessor(encoder, classifier):
+    return OrderPreprocessor(encoder, classifier.feature_names_in_)
+
+
+@pytest.fixture
+def sample():
+    """Raw DataCo rows of df_trying_subset.csv, read as /upload reads them."""
+    return read_upload(SAMPLE_CSV)
+
+
+@pytest.fixture
+def app_dirs(tmp_path):
+    """Upload, prediction, cache and summary directories of one test."""
+    dirs = {name: str(tmp_path / name) for name in ('uploads', 'classification', 'regression', 'scores',
+                                                    'summary', 'cache')}
+    os.makedirs(dirs['uploads'])
+    return dirs
+
+
+@pytest.fixture
+def backend_app(app_dirs, monkeypatch):
+    """
+    The Flask app module with every directory it writes moved to app_dirs,
+    so requests never touch backend/.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        import app as backend_app
+    from optimization import orders
+    from utils import dashboard
+    from utils.cache import PredictionCache
+
+    dirs = app_dirs
+    monkeypatch.setattr(backend_app, 'UPLOAD_FOLDER', dirs['uploads'])
+    monkeypatch.setitem(backend_app.app.config, 'UPLOAD_FOLDER', dirs['uploads'])
+    for module in (backend_app, orders):
+        monkeypatch.setattr(module, 'CLASSIFICATION_DIR', dirs['classification'], raising=False)
+        monkeypatch.setattr(module, 'REGRESSION_DIR', dirs['regression'], raising=False)
+        monkeypatch.setattr(module, 'SCORES_DIR', dirs['scores'])
+    monkeypatch.setitem(orders.PREDICTION_DIRS, 'risk', dirs['classification'])
+    monkeypatch.setitem(orders.PREDICTION_DIRS, 'days', dirs['regression'])
+    monkeypatch.setitem(backend_app.EXPORT_FOLDERS, 'processed', (dirs['uploads'], '_processed'))
+    monkeypatch.setitem(backend_app.EXPORT_FOLDERS, 'classification', (dirs['classification'], '_prediction'))
+    monkeypatch.setitem(backend_app.EXPORT_FOLDERS, 'regression', (dirs['regression'], '_prediction'))
+    monkeypatch.setattr(dashboard, 'SUMMARY_DIR', dirs['summary'])
+    monkeypatch.setattr(backend_app, 'prediction_cache', PredictionCache(dirs['cache']))
+    monkeypatch.setattr(backend_app, 'dashboard_cubes', dashboard.CubeStore())
+    monkeypatch.setattr(backend_app, 'order_store', orders.OrderStore())
+    return backend_app
+
+
+@pytest.fixture
+def client(backend_app):
+    return backend_app.app.test_client()
+
+
+def upload(client, name='orders', path=SAMPLE_CSV, **form):
+    with open(path, 'rb') as f:
+        return client.post('/upload', data={'file': (f, f'{name}.csv'), **form},
+                           content_type='multipart/form-data')
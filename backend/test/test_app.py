@@ -0,0 +1,200 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import SAMPLE_CSV, upload
+from utils.batching import MicroBatcher
+from utils.preprocess import read_upload
+from utils.storage import ARROW_STREAM, arrow_bytes, read_arrow
+
+
+def inside(path, directory):
+    return os.path.commonpath([os.path.abspath(path), directory]) == directory
+
+
+def test_prediction_outputs_stay_in_their_folders(client, app_dirs):
+    assert upload(client, 'orders').status_code == 200
+
+    for endpoint, folder in (('/prediction', 'classification'), ('/regression', 'regression')):
+        response = client.post(endpoint, json={'file_name': '../../orders'})
+        assert response.status_code == 200
+        saved_to = response.get_json()['saved_to']
+        assert inside(saved_to, app_dirs[folder])
+        assert os.path.basename(saved_to).startswith('orders_prediction')
+
+
+def test_prediction_after_incremental_upload_serves_fresh_scores(client, tmp_path, preprocessor, classifier,
+                                                                 regressor):
+    assert upload(client, 'orders').status_code == 200
+
+    # 附加上傳：少了最後幾列，並修改一列的運送方式
+    raw = pd.read_csv(SAMPLE_CSV).iloc[:-5]
+    raw.loc[0, 'Shipping Mode'] = 'Same Day'
+    path = tmp_path / 'orders.csv'
+    raw.to_csv(path, index=False)
+    assert upload(client, 'orders', path=str(path), incremental='1').status_code == 200
+
+    features = preprocessor.transform(read_upload(str(path)))
+    expected = {'/prediction': classifier.predict_proba(features)[:, 1], '/regression': regressor.predict(features)}
+    for endpoint, values in expected.items():
+        response = client.post(endpoint, json={'file_name': 'orders'})
+        assert response.status_code == 200
+        np.testing.assert_allclose(response.get_json()['predictions'], values, rtol=1e-6)
+
+
+def test_sparse_scores_cache_follows_the_encoder_version(client, backend_app, monkeypatch):
+    assert upload(client, 'orders').status_code == 200
+    request = {'file_name': 'orders', 'sparse': True}
+    assert client.post('/score', json=request).get_json()['cached'] is False
+    assert client.post('/score', json=request).get_json()['cached'] is True
+
+    # 模擬 encoder 熱更新：版本改變後不可再使用舊的快取
+    registry = backend_app.model_registry
+    version = registry.version
+    monkeypatch.setattr(registry, 'version', lambda name: 'reloaded' if name == 'encoder' else version(name))
+    assert client.post('/score', json=request).get_json()['cached'] is False
+    # 非稀疏路徑讀取已編碼的特徵，不受 encoder 版本影響
+    assert client.post('/score', json={'file_name': 'orders'}).get_json()['cached'] is False
+    assert client.post('/score', json={'file_name': 'orders'}).get_json()['cached'] is True
+
+
+def test_delay_endpoint_counts_off_grid_thresholds_exactly(client, sample):
+    assert upload(client, 'orders').status_code == 200
+    risk = client.post('/prediction', json={'file_name': 'orders'}).get_json()['predictions']
+
+    response = client.get('/api/dashboard/orders/delay', query_string={'dimension': 'Market', 'threshold': 0.555})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['threshold'] == 0.555
+    expected = (pd.Series(np.asarray(risk) > 0.555).groupby(sample['Market'].astype(str)).sum()).to_dict()
+    assert body['late'] == expected
+
+
+@pytest.mark.parametrize('endpoint', ['/prediction', '/regression'])
+def test_cache_hits_leave_the_prediction_artifact_alone(client, endpoint):
+    assert upload(client, 'orders').status_code == 200
+    first = client.post(endpoint, json={'file_name': 'orders'})
+    modified = os.path.getmtime(first.get_json()['saved_to'])
+
+    hit = client.post(endpoint, json={'file_name': 'orders'})
+    assert hit.get_json()['cached'] is True
+    assert hit.get_json()['saved_to'] == first.get_json()['saved_to']
+    assert os.path.getmtime(hit.get_json()['saved_to']) == modified
+    # 不重寫檔案，也就不需重新解析 CSV 建立儀表板
+    assert 'csv_parse' not in hit.headers['Server-Timing']
+    assert hit.get_json()['predictions'] == first.get_json()['predictions']
+
+
+@pytest.fixture
+def records():
+    # 經過 JSON 來回轉換，與前端送出的資料相同
+    return json.loads(pd.read_csv(SAMPLE_CSV).to_json(orient='records'))
+
+
+@pytest.fixture
+def expected_scores(sample, preprocessor, classifier, regressor):
+    features = preprocessor.transform(sample)
+    return classifier.predict_proba(features)[:, 1], regressor.predict(features)
+
+
+def test_score_batch_scores_json_records_in_order(client, records, expected_scores):
+    response = client.post('/score_batch', json={'records': records})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['Order Id'] == [record['Order Id'] for record in records]
+    assert body['Order Item Id'] == [record['Order Item Id'] for record in records]
+    np.testing.assert_allclose(body['risk'], expected_scores[0], rtol=1e-6)
+    np.testing.assert_allclose(body['days'], expected_scores[1], rtol=1e-6)
+    assert body['batchRows'] >= len(records)
+    assert 'micro_batch' in response.headers['Server-Timing']
+
+
+def test_score_batch_answers_arrow_with_arrow(client, sample, expected_scores):
+    response = client.post('/score_batch', data=arrow_bytes(sample), content_type=ARROW_STREAM,
+                           headers={'Accept': ARROW_STREAM})
+    assert response.status_code == 200 and response.mimetype == ARROW_STREAM
+    result = read_arrow(response.get_data())
+    assert list(result.columns) == ['Order Id', 'Order Item Id', 'risk', 'days']
+    np.testing.assert_allclose(result['risk'], expected_scores[0], rtol=1e-6)
+
+
+def test_score_batch_accepts_iso_dates_and_rejects_garbage(client, records):
+    iso = [{**record, 'order date (DateOrders)': '2018-01-31T22:56:00'} for record in records[:1]]
+    plain = [{**record, 'order date (DateOrders)': '1/31/2018 22:56'} for record in records[:1]]
+    responses = [client.post('/score_batch', json=body).get_json() for body in (iso, plain)]
+    assert responses[0]['risk'] == responses[1]['risk']
+
+    garbage = [{**record, 'order date (DateOrders)': 'garbage'} for record in records[:1]]
+    response = client.post('/score_batch', json=garbage)
+    assert response.status_code == 400 and 'garbage' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('body, status', [
+    ({'records': []}, 400),
+    ({'records': 'nope'}, 400),
+    ([{'Order Id': 1}], 400),
+])
+def test_score_batch_rejects_bad_input(client, body, status):
+    response = client.post('/score_batch', json=body)
+    assert response.status_code == status
+    assert 'error' in response.get_json()
+
+
+def test_score_order_scores_one_record(client, records, expected_scores):
+    response = client.post('/score_order', json=records[3])
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['Order Id'] == records[3]['Order Id']
+    assert body['risk'] == pytest.approx(expected_scores[0][3], rel=1e-6)
+    assert body['days'] == pytest.approx(expected_scores[1][3], rel=1e-6)
+
+    assert client.post('/score_order', json=records[:2]).status_code == 400
+    invalid = {**records[3], 'Order Item Quantity': 'many'}
+    assert client.post('/score_order', json=invalid).status_code == 400
+
+
+def test_requests_with_different_extra_columns_share_a_batch(backend_app, records, monkeypatch):
+    batcher = MicroBatcher(backend_app.score_orders, max_wait=1.0, max_rows=4)
+    monkeypatch.setattr(backend_app, 'score_batcher', batcher)
+    # 一個請求帶有模型不使用的整數欄位，另一個沒有
+    bodies = [records[:2], [{key: value for key, value in record.items() if key != 'Days for shipping (real)'}
+                            for record in records[2:4]]]
+    responses = [None, None]
+    start = threading.Barrier(2)
+
+    def post(k):
+        start.wait()
+        responses[k] = backend_app.app.test_client().post('/score_batch', json=bodies[k])
+
+    threads = [threading.Thread(target=post, args=(k,)) for k in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [response.status_code for response in responses] == [200, 200]
+    assert [response.get_json()['batchRows'] for response in responses] == [4, 4]
+
+
+@pytest.fixture
+def predicted(client):
+    assert upload(client, 'orders').status_code == 200
+    for endpoint in ('/prediction', '/regression'):
+        assert client.post(endpoint, json={'file_name': 'orders'}).status_code == 200
+
+
+@pytest.mark.parametrize('endpoint, body', [
+    ('/ga_optimize', {'islands': 0}),
+    ('/ga_optimize', {'islands': -2, 'workers': 2}),
+    ('/tabu_optimize', {'starts': 0}),
+    ('/tabu_optimize', {'seed': -1}),
+    ('/tabu_optimize', {'starts': 2, 'seed': -1}),
+])
+def test_optimizers_reject_bad_parameters(client, predicted, endpoint, body):
+    response = client.post(endpoint, json={'file_name': 'orders', **body})
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
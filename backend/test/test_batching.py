@@ -0,0 +1,74 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.batching import MicroBatcher
+from utils.metrics import metrics
+
+
+def double(df):
+    if (df['x'] < 0).any():
+        raise ValueError('negative x')
+    with metrics.stage('double', rows=len(df)):
+        return df['x'].to_numpy() * 2, df['x'].to_numpy() + 1
+
+
+def submit_together(batcher, frames):
+    """Submits every frame from its own thread and returns (results, errors) in frame order."""
+    results, errors = [None] * len(frames), [None] * len(frames)
+    start = threading.Barrier(len(frames))
+
+    def call(k):
+        start.wait()
+        try:
+            results[k] = batcher.submit(frames[k])
+        except Exception as e:
+            errors[k] = e
+
+    threads = [threading.Thread(target=call, args=(k,)) for k in range(len(frames))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_each_caller_gets_its_own_rows():
+    batcher = MicroBatcher(double, max_wait=1.0, max_rows=10)
+    frames = [pd.DataFrame({'x': np.arange(k, k + size)}) for k, size in ((0, 3), (10, 1), (20, 6))]
+    results, errors = submit_together(batcher, frames)
+
+    assert errors == [None] * 3
+    for frame, ((doubled, plus_one), batch_rows) in zip(frames, results):
+        np.testing.assert_array_equal(doubled, frame['x'].to_numpy() * 2)
+        np.testing.assert_array_equal(plus_one, frame['x'].to_numpy() + 1)
+        assert batch_rows == 10
+    assert batcher.info()['batches'] == 1
+
+
+def test_a_failing_caller_does_not_fail_the_batch():
+    batcher = MicroBatcher(double, max_wait=1.0, max_rows=3)
+    frames = [pd.DataFrame({'x': [1]}), pd.DataFrame({'x': [-1]}), pd.DataFrame({'x': [2]})]
+    results, errors = submit_together(batcher, frames)
+
+    assert isinstance(errors[1], ValueError) and results[1] is None
+    assert results[0][0][0].tolist() == [2] and results[2][0][0].tolist() == [4]
+    # 合併失敗後逐一重試，每個成功的請求各自成一批
+    assert results[0][1] == results[2][1] == 1
+
+
+def test_batch_stage_timings_reach_the_caller():
+    batcher = MicroBatcher(double)
+    token, timings = metrics.begin_request()
+    try:
+        batcher.submit(pd.DataFrame({'x': [1, 2]}))
+    finally:
+        metrics.end_request(token)
+    assert {'double', 'micro_batch'} <= {name for name, _ in timings}
+
+
+def test_errors_are_raised_to_the_caller():
+    with pytest.raises(ValueError, match='negative'):
+        MicroBatcher(double).submit(pd.DataFrame({'x': [-3]}))
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.dashboard import DIMENSIONS, MONTH_DIMENSION, RiskCube, dimension_codes
+from utils.preprocess import DATE_COLUMNS, DATE_FORMAT
+
+THRESHOLDS = [0.0, 0.29, 0.5, 0.55, 0.555, 0.5551, 0.999, 1.0]
+
+
+@pytest.fixture
+def scored(sample):
+    rng = np.random.default_rng(0)
+    risk = rng.random(len(sample))
+    # 邊界上的值、門檻本身與缺值都要算對
+    risk[:6] = [0.55, 0.555, 0.29, 0.0, 1.0, np.nan]
+    return sample, risk
+
+
+def expected_late(raw, risk, dimension, threshold):
+    if dimension == MONTH_DIMENSION:
+        keys = pd.to_datetime(raw[DATE_COLUMNS['Order']], format=DATE_FORMAT).dt.strftime('%Y-%m')
+    else:
+        keys = raw[dimension].astype(str)
+    late = pd.Series(np.nan_to_num(risk, nan=0.0) > threshold, index=raw.index)
+    grouped = late.groupby(keys)
+    return grouped.sum().astype(int).to_dict(), grouped.size().to_dict()
+
+
+@pytest.mark.parametrize('threshold', THRESHOLDS)
+@pytest.mark.parametrize('dimension', DIMENSIONS)
+def test_cube_counts_match_groupby(scored, dimension, threshold):
+    raw, risk = scored
+    labels, late, rows, effective = RiskCube.build(raw, risk).late(dimension, threshold)
+    expected, sizes = expected_late(raw, risk, dimension, threshold)
+    assert effective == threshold
+    assert dict(zip(labels.tolist(), late.tolist())) == expected
+    assert dict(zip(labels.tolist(), rows.tolist())) == sizes
+
+
+@pytest.mark.parametrize('threshold', THRESHOLDS)
+def test_overview_is_exact_between_edges(scored, threshold):
+    raw, risk = scored
+    late = int((np.nan_to_num(risk, nan=0.0) > threshold).sum())
+    assert RiskCube.build(raw, risk).overview(threshold) == {'Late': late, 'On Time': len(raw) - late}
+
+
+def test_cube_survives_a_round_trip(scored):
+    raw, risk = scored
+    cube = RiskCube.build(raw, risk)
+    restored = RiskCube.from_arrays(cube.to_arrays())
+    for dimension in cube.dimensions:
+        for threshold in THRESHOLDS:
+            for a, b in zip(cube.late(dimension, threshold), restored.late(dimension, threshold)):
+                np.testing.assert_array_equal(a, b)
+
+
+def test_thresholds_outside_unit_interval_are_rejected(scored):
+    with pytest.raises(ValueError):
+        RiskCube.build(*scored).late('Market', 1.5)
+
+
+def test_missing_dimension_values_are_left_out(sample):
+    raw = sample.assign(Market=sample['Market'].astype(object).where(sample.index % 3 > 0))
+    codes, labels = dimension_codes(raw, 'Market')
+    assert (codes[::3] == -1).all()
+    _, late, rows, _ = RiskCube.build(raw, np.ones(len(raw))).late('Market', 0.5)
+    assert rows.sum() == late.sum() == (raw['Market'].notna()).sum()
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.incremental import refresh_scores
+
+VERSION = 'clf+reg+enc'
+
+
+class Scorer:
+    """score_rows stand-in that records which rows it was asked to score."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, rows):
+        self.calls.append(rows['Order Item Id'].tolist())
+        return rows['Sales'].to_numpy() / 1000, rows['Order Item Id'].to_numpy() % 7
+
+
+def orders(item_ids, sales=None):
+    item_ids = np.asarray(item_ids)
+    return pd.DataFrame({
+        'Order Id': item_ids // 2,
+        'Order Item Id': item_ids,
+        'Sales': np.asarray(sales if sales is not None else item_ids * 10.0, dtype=np.float32),
+    })
+
+
+def test_first_run_scores_every_row():
+    score = Scorer()
+    scores, stats = refresh_scores(orders(range(6)), None, score, VERSION)
+    assert score.calls == [list(range(6))]
+    assert stats == {'rows': 6, 'rescored': 6, 'reused': 0}
+    assert list(scores.columns) == ['Order Id', 'Order Item Id', 'risk', 'days', 'row_hash']
+
+
+def test_new_changed_and_removed_rows_are_counted():
+    previous, _ = refresh_scores(orders(range(6)), None, Scorer(), VERSION)
+
+    # 第 0 列刪除、第 2 列修改、新增 6 與 7
+    raw = orders([1, 2, 3, 4, 5, 6, 7], sales=[10, 99, 30, 40, 50, 60, 70])
+    score = Scorer()
+    scores, stats = refresh_scores(raw, previous, score, VERSION)
+
+    assert score.calls == [[2, 6, 7]]
+    assert stats == {'rows': 7, 'rescored': 3, 'reused': 4, 'new': 2, 'changed': 1, 'removed': 1}
+    assert scores['Order Item Id'].tolist() == [1, 2, 3, 4, 5, 6, 7]
+    np.testing.assert_allclose(scores['risk'], raw['Sales'] / 1000, rtol=1e-6)
+
+
+def test_unchanged_upload_reuses_everything():
+    raw = orders(range(5))
+    previous, _ = refresh_scores(raw, None, Scorer(), VERSION)
+    score = Scorer()
+    scores, stats = refresh_scores(raw, previous, score, VERSION)
+    assert score.calls == []
+    assert stats == {'rows': 5, 'rescored': 0, 'reused': 5, 'new': 0, 'changed': 0, 'removed': 0}
+    pd.testing.assert_frame_equal(scores, previous)
+
+
+@pytest.mark.parametrize('version', ['clf2+reg+enc', 'clf+reg+enc2'])
+def test_a_new_model_version_rescores_every_row(version):
+    raw = orders(range(4))
+    previous, _ = refresh_scores(raw, None, Scorer(), VERSION)
+    _, stats = refresh_scores(raw, previous, Scorer(), version)
+    assert stats['rescored'] == 4 and stats['changed'] == 4 and stats['new'] == 0
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from utils.inference import CompiledPipeline, same_preprocessing, score_features
+from utils.storage import downcast
+
+
+@pytest.fixture
+def features(sample, preprocessor):
+    # 與 /upload 存檔後讀回的型別相同
+    return downcast(preprocessor.transform(sample))
+
+
+def with_missing(features):
+    holes = features.copy()
+    rng = np.random.default_rng(0)
+    for column in rng.choice(holes.columns[holes.dtypes == np.float32], 20, replace=False):
+        holes.loc[rng.choice(len(holes), 5, replace=False), column] = np.nan
+    return holes
+
+
+@pytest.mark.parametrize('block_rows', [1_536, 16_384])
+@pytest.mark.parametrize('missing', [False, True])
+def test_compiled_predictions_equal_the_pipelines(features, classifier, regressor, block_rows, missing):
+    X = with_missing(features) if missing else features
+    compiled = CompiledPipeline(classifier, n_threads=1, block_rows=block_rows)
+    assert np.array_equal(compiled.predict(X), classifier.predict_proba(X)[:, 1])
+    assert np.array_equal(compiled.predict_proba(X), classifier.predict_proba(X))
+    assert np.array_equal(CompiledPipeline(regressor, block_rows=block_rows).predict(X), regressor.predict(X))
+
+
+def test_compiled_pipeline_reorders_columns(features, classifier):
+    shuffled = features[features.columns[::-1]]
+    assert np.array_equal(CompiledPipeline(classifier).predict(shuffled), classifier.predict_proba(features)[:, 1])
+
+
+@pytest.mark.filterwarnings('ignore:X does not have valid feature names')
+def test_compiled_pipeline_scores_float64_and_arrays(features, regressor):
+    wide = features.astype(np.float64)
+    compiled = CompiledPipeline(regressor)
+    assert np.array_equal(compiled.predict(wide), regressor.predict(wide))
+    assert np.array_equal(compiled.predict(wide.to_numpy()), regressor.predict(wide.to_numpy()))
+
+
+def test_score_features_matches_with_compiled_models(features, classifier, regressor):
+    risk, days, shared = score_features(features, classifier, regressor)
+    compiled = score_features(features, CompiledPipeline(classifier), CompiledPipeline(regressor))
+    assert np.array_equal(compiled[0], risk) and np.array_equal(compiled[1], days)
+    assert compiled[2] == shared == same_preprocessing(classifier, regressor)
+
+
+def test_other_pipelines_are_not_compiled(features, classifier):
+    other = Pipeline([('impute', SimpleImputer()), ('scale', StandardScaler()), ('xgb', classifier[-1])])
+    with pytest.raises(ValueError):
+        CompiledPipeline(other)
+
+
+def test_empty_frames_score_to_empty_arrays(features, classifier):
+    assert CompiledPipeline(classifier).predict(features.iloc[:0]).shape == (0,)
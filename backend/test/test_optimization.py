@@ -0,0 +1,298 @@
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from conftest import order_table
+from optimization import shared
+from optimization.exact import exact_search
+from optimization.ga import create_population, crossover, genetic, mutate
+from optimization.islands import MAX_ISLANDS, MAX_POPULATION_BYTES, island_count, island_genetic
+from optimization.multistart import multi_start_tabu
+from optimization.scoring import OrderScorer, fitness
+from optimization.shared import get_pool, pool_workers, run_bounded
+from optimization.solver import solve
+from optimization.tabu import TabuMemory, tabu_search
+
+
+@pytest.mark.parametrize('workers, expected', [(None, os.cpu_count()), (0, os.cpu_count()), (-3, 1), (1, 1),
+                                               (10_000, os.cpu_count())])
+def test_pool_workers_are_clamped_to_the_cores(workers, expected):
+    assert pool_workers(workers) == expected
+
+
+def test_one_pool_is_shared():
+    assert get_pool() is get_pool()
+    assert get_pool()._max_workers == os.cpu_count()
+
+
+class Tracker:
+    """Task stand-in that records the most tasks running at once."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = self.peak = 0
+
+    def __call__(self, k):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(0.01)
+        with self.lock:
+            self.running -= 1
+        return k * k
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3])
+def test_run_bounded_caps_the_calls_in_flight(limit):
+    track = Tracker()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = run_bounded(pool, [(track, k) for k in range(10)], limit)
+    assert results == [k * k for k in range(10)]
+    assert track.peak == limit
+
+
+def test_run_bounded_submits_nothing_after_a_stop():
+    seen = []
+
+    def finished(k, result):
+        seen.append(k)
+        return True
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = run_bounded(pool, [(Tracker(), k) for k in range(6)], 2, finished)
+    # 第一個完成時就停止：另一個已在執行的仍會收回結果
+    assert sorted(seen) == [0, 1] and results[2:] == [None] * 4
+
+
+@pytest.mark.parametrize('due', [False, True])
+def test_island_genetic_is_deterministic(due):
+    orders = order_table(40, seed=1, due=due)
+    first = island_genetic(orders, islands=3, workers=1, population_size=12, generations=8, seed=7)
+    again = island_genetic(orders, islands=3, workers=1, population_size=12, generations=8, seed=7)
+    assert first[0] == again[0] and first[1] == again[1]
+    assert sorted(first[0]) == list(orders.index)
+    assert first[1] == pytest.approx(fitness(first[0], orders))
+
+
+@pytest.fixture
+def two_core_pool(monkeypatch):
+    """A fresh two-process shared pool, whatever the machine's core count."""
+    monkeypatch.setattr(shared.os, 'cpu_count', lambda: 2)
+    monkeypatch.setattr(shared, '_POOL', None)
+    yield
+    shared._POOL.shutdown()
+
+
+def test_island_counts_are_bounded():
+    assert island_count(4, 30, 100) == 4
+    assert island_count(10_000, 30, 100) == MAX_ISLANDS
+    # 族群總大小超過共用記憶體上限時減少島數，但至少保留一個
+    assert island_count(MAX_ISLANDS, 30, 500_000) == MAX_POPULATION_BYTES // (30 * 500_000 * 4)
+    assert island_count(2, 30, 10 ** 9) == 1
+    with pytest.raises(ValueError):
+        island_genetic(order_table(10, seed=0), islands=0)
+
+
+def test_island_genetic_gives_the_same_result_in_the_pool(two_core_pool):
+    orders = order_table(30, seed=2)
+    local = island_genetic(orders, islands=2, workers=1, population_size=10, generations=6, seed=3)
+    pooled = island_genetic(orders, islands=2, workers=2, population_size=10, generations=6, seed=3)
+    assert local[0] == pooled[0] and local[1] == pooled[1]
+    assert shared._POOL._max_workers == 2
+
+
+@pytest.mark.parametrize('due', [False, True])
+def test_applied_swaps_keep_the_evaluator_in_step(due):
+    scorer = OrderScorer.from_orders(order_table(50, seed=4, due=due))
+    rng = np.random.default_rng(0)
+    evaluator = scorer.evaluator(rng.permutation(50))
+    score = evaluator.score
+    for _ in range(200):
+        i, j = rng.choice(50, 2, replace=False)
+        score += evaluator.swap_deltas(np.array([i]), np.array([j]))[0]
+        evaluator.apply_swap(i, j)
+        assert score == pytest.approx(scorer.score(evaluator.sequence))
+    np.testing.assert_allclose(evaluator.completion, np.cumsum(scorer.durations[evaluator.sequence]))
+
+
+def test_tabu_pairs_expire_after_their_tenure():
+    tabu = TabuMemory(2)
+    tabu.add(3, 1)
+    assert (1, 3) in tabu and (3, 1) in tabu
+    tabu.add(1, 3)
+    tabu.add(4, 5)
+    # 同一組交換加入兩次，要等兩次都過期才解禁
+    assert (1, 3) in tabu
+    tabu.add(6, 7)
+    assert (1, 3) not in tabu and (4, 5) in tabu
+
+
+@pytest.mark.parametrize('due', [False, True])
+def test_tabu_search_returns_its_best_sequence(due):
+    orders = order_table(60, seed=5, due=due)
+    best_order, best_score = tabu_search(orders, list(orders.index), seed=1, max_iter=150)
+    assert sorted(best_order) == list(orders.index)
+    assert best_score == pytest.approx(fitness(best_order, orders))
+    assert (best_order, best_score) == tabu_search(orders, list(orders.index), seed=1, max_iter=150)
+
+
+def reference_score(values, durations, due, sequence):
+    """The objective by definition, one order at a time."""
+    total, clock = 0.0, 0.0
+    for order in sequence:
+        clock += durations[order]
+        total += values[order] * (clock if due is None else max(clock - due[order], 0.0))
+    return total
+
+
+def all_pairs(size):
+    i, j = np.triu_indices(size, k=1)
+    return np.concatenate([i, j]), np.concatenate([j, i])
+
+
+def test_unit_swap_deltas_match_full_rescoring():
+    orders = order_table(25, seed=6).drop(columns=['days'])
+    scorer = OrderScorer.from_orders(orders)
+    assert scorer.closed_form_swaps
+    sequence = np.random.default_rng(1).permutation(25)
+    i, j = all_pairs(25)
+    deltas = scorer.swap_deltas(sequence, i, j)
+    base = scorer.score(sequence)
+    for k in range(len(i)):
+        swapped = sequence.copy()
+        swapped[[i[k], j[k]]] = swapped[[j[k], i[k]]]
+        assert deltas[k] == pytest.approx(scorer.score(swapped) - base)
+
+
+def test_population_scores_match_the_definition():
+    orders = order_table(15, seed=7).drop(columns=['days'])
+    scorer = OrderScorer.from_orders(orders)
+    population = np.array([np.random.default_rng(k).permutation(15) for k in range(6)])
+    expected = [reference_score(scorer.values, np.ones(15), None, row) for row in population]
+    np.testing.assert_allclose(scorer.score_population(population), expected)
+    assert fitness(list(orders.index[population[0]]), orders) == pytest.approx(expected[0])
+
+
+@pytest.mark.parametrize('due', [False, True])
+def test_duration_swap_deltas_match_full_rescoring(due):
+    orders = order_table(20, seed=8, due=due)
+    scorer = OrderScorer.from_orders(orders)
+    assert not scorer.closed_form_swaps and scorer.is_linear != due
+    sequence = np.random.default_rng(2).permutation(20)
+    assert scorer.score(sequence) == pytest.approx(
+        reference_score(scorer.values, scorer.durations, scorer.due_dates, sequence))
+
+    i, j = all_pairs(20)
+    deltas = scorer.evaluator(sequence).swap_deltas(i, j)
+    base = scorer.score(sequence)
+    for k in range(len(i)):
+        swapped = sequence.copy()
+        swapped[[i[k], j[k]]] = swapped[[j[k], i[k]]]
+        assert deltas[k] == pytest.approx(scorer.score(swapped) - base, abs=1e-9)
+
+
+@pytest.mark.parametrize('unit', [True, False])
+def test_exact_search_is_optimal(unit):
+    orders = order_table(7, seed=9)
+    if unit:
+        orders = orders.drop(columns=['days'])
+    best = min(fitness(list(permutation), orders) for permutation in itertools.permutations(orders.index))
+    order, score = exact_search(orders)
+    assert sorted(order) == list(orders.index)
+    assert score == pytest.approx(best)
+
+
+def test_auto_uses_the_exact_solver_only_without_due_dates():
+    assert solve(order_table(10, seed=1))[2] == 'exact'
+    assert solve(order_table(10, seed=1, due=True), max_iter=5)[2] == 'tabu'
+    with pytest.raises(ValueError):
+        exact_search(order_table(10, seed=1, due=True))
+
+
+def is_permutation_rows(population):
+    size = population.shape[1]
+    return (np.sort(population, axis=1) == np.arange(size)).all()
+
+
+@pytest.mark.parametrize('size', [2, 3, 10, 57])
+def test_ox1_children_are_permutations_keeping_a_parent_slice(size):
+    rng = np.random.default_rng(size)
+    parents1 = create_population(size, 40, rng)
+    parents2 = create_population(size, 40, rng)
+    children = crossover(parents1, parents2, rng)
+    assert children.shape == parents1.shape and is_permutation_rows(children)
+    # 每個子代至少保留 parent1 在原位置的一段連續片段
+    assert ((children == parents1).sum(axis=1) >= 1).all()
+
+
+def test_ox1_fills_the_rest_in_parent2_order():
+    rng = np.random.default_rng(0)
+    parents1 = create_population(12, 30, rng)
+    parents2 = create_population(12, 30, rng)
+    children = crossover(parents1, parents2, rng)
+    for child, p1, p2 in zip(children, parents1, parents2):
+        kept = child == p1
+        filled = child[~kept]
+        assert filled.tolist() == [order for order in p2 if order in set(filled.tolist())]
+
+
+@pytest.mark.parametrize('rate', [0.0, 0.2, 1.0])
+def test_mutation_keeps_permutations(rate):
+    rng = np.random.default_rng(3)
+    population = create_population(31, 20, rng)
+    assert is_permutation_rows(mutate(population.copy(), rate, rng))
+
+
+def test_genetic_is_deterministic_and_scores_its_result():
+    orders = order_table(35, seed=10)
+    first = genetic(orders, seed=4, generations=15)
+    assert first == genetic(orders, seed=4, generations=15)
+    assert sorted(first[0]) == list(orders.index)
+    assert first[1] == pytest.approx(fitness(first[0], orders))
+
+
+@pytest.mark.parametrize('due', [False, True])
+def test_multi_start_tabu_is_deterministic(due):
+    orders = order_table(40, seed=11, due=due)
+    first = multi_start_tabu(orders, starts=3, workers=1, seed=21, max_iter=40)
+    again = multi_start_tabu(orders, starts=3, workers=1, seed=21, max_iter=40)
+    assert first == again
+    best_order, best_score, info = first
+    assert info['seed'] == 21 and [run['start'] for run in info['runs']] == ['sorted', 'random', 'random']
+    assert best_score == min(run['score'] for run in info['runs'])
+    assert best_score == pytest.approx(fitness(best_order, orders))
+
+
+def test_a_random_start_is_reproduced_by_tabu_search_with_its_seed():
+    orders = order_table(30, seed=12)
+    _, _, info = multi_start_tabu(orders, starts=2, workers=1, seed=5, max_iter=30)
+    run = info['runs'][1]
+    _, score = tabu_search(orders, list(orders.index), seed=run['seed'], max_iter=30)
+    assert score == run['score']
+
+
+def test_an_omitted_seed_is_returned_and_reproduces_the_run():
+    orders = order_table(30, seed=14)
+    first = multi_start_tabu(orders, starts=2, workers=1, max_iter=20)
+    seed = first[2]['seed']
+    # JavaScript 的 Number 可精確表示的範圍內
+    assert isinstance(seed, int) and 0 <= seed < 2 ** 32
+    assert multi_start_tabu(orders, starts=2, workers=1, seed=seed, max_iter=20) == first
+
+
+@pytest.mark.parametrize('params', [{'starts': 0}, {'starts': -1}, {'seed': -1}])
+def test_multi_start_tabu_rejects_bad_parameters(params):
+    with pytest.raises(ValueError):
+        multi_start_tabu(order_table(10, seed=0), **{'workers': 1, **params})
+
+
+def test_multi_start_tabu_gives_the_same_result_in_the_pool(two_core_pool):
+    orders = order_table(30, seed=13, due=True)
+    local = multi_start_tabu(orders, starts=3, workers=1, seed=8, max_iter=25)
+    pooled = multi_start_tabu(orders, starts=3, workers=2, seed=8, max_iter=25)
+    assert local == pooled
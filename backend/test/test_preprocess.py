@@ -0,0 +1,61 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import SAMPLE_CSV
+from utils.preprocess import DATE_COLUMNS, DATE_FORMAT, DROP_COLUMNS, UPLOAD_DTYPES, coerce_upload, read_upload
+
+
+def csv_with(changes):
+    raw = pd.read_csv(SAMPLE_CSV)
+    for (row, column), value in changes.items():
+        raw.loc[row, column] = value
+    return io.StringIO(raw.to_csv(index=False))
+
+
+def test_dropped_columns_have_no_read_dtype():
+    assert not set(UPLOAD_DTYPES) & set(DROP_COLUMNS)
+
+
+def test_blank_label_and_quantity_are_read(preprocessor, classifier):
+    df = read_upload(csv_with({(0, 'Late_delivery_risk'): np.nan, (1, 'Order Item Quantity'): np.nan,
+                               (2, 'Days for shipping (real)'): np.nan}))
+    assert df['Order Item Quantity'].isna().sum() == 1
+
+    features = preprocessor.transform(df)
+    risk = classifier.predict_proba(features)[:, 1]
+    assert np.isfinite(risk).all()
+
+
+def test_blank_quantity_is_imputed_like_the_baseline(preprocessor, classifier):
+    blank = read_upload(csv_with({(1, 'Order Item Quantity'): np.nan}))
+    # 基準版本以 float64 讀入，空白交給 imputer 處理
+    baseline = blank.astype({'Order Item Quantity': np.float64})
+    expected = classifier.predict_proba(preprocessor.transform(baseline))[:, 1]
+    np.testing.assert_allclose(classifier.predict_proba(preprocessor.transform(blank))[:, 1], expected)
+
+
+def test_coerce_upload_matches_read_upload(sample):
+    records = pd.read_csv(SAMPLE_CSV)
+    coerced = coerce_upload(records)
+    assert coerced.dtypes.to_dict() == sample.dtypes.to_dict()
+
+
+def iso_dates(df):
+    return df.assign(**{column: pd.to_datetime(df[column], format=DATE_FORMAT).dt.strftime('%Y-%m-%dT%H:%M:%S')
+                        for column in DATE_COLUMNS.values()})
+
+
+def test_iso_dates_give_the_same_features(sample, preprocessor):
+    pd.testing.assert_frame_equal(preprocessor.transform(iso_dates(sample)), preprocessor.transform(sample))
+
+
+def test_blank_dates_are_missing_and_unparseable_dates_are_rejected(sample, preprocessor):
+    column = DATE_COLUMNS['Order']
+    features = preprocessor.transform(sample.assign(**{column: sample[column].where(sample.index > 0, '')}))
+    assert features.loc[0, 'OrderYear'] is pd.NA and features['OrderYear'].notna().sum() == len(sample) - 1
+
+    with pytest.raises(ValueError, match='garbage'):
+        preprocessor.transform(sample.assign(**{column: sample[column].where(sample.index > 0, 'garbage')}))
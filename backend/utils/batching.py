@@ -0,0 +1,142 @@
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.metrics import metrics
+
+
+class PendingBatch:
+    """One caller's rows waiting in a MicroBatcher, and their results."""
+
+    def __init__(self, df):
+        self.df = df
+        self.queued_at = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.batch_rows = None
+        self.timings = []
+
+    def finish(self, result=None, error=None, batch_rows=None, timings=()):
+        self.result = result
+        self.error = error
+        self.batch_rows = batch_rows
+        self.timings = list(timings)
+        self.done.set()
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent scoring calls into one model call.
+
+    Callers hand their rows to ``submit`` and block; a single worker thread
+    collects calls until ``max_rows`` rows are queued or the oldest call
+    has waited ``max_wait`` seconds, scores them as one frame with
+    ``score(df) -> tuple of arrays`` and hands each caller its own slice
+    of the results. While one batch is being scored the next one builds
+    up, so under load each model call covers many requests; with
+    ``max_wait=0`` only calls already queued are combined.
+
+    If a combined batch fails, its calls are retried one by one, so one
+    caller's bad rows do not fail the others. Callers should pass frames
+    with the same columns: pd.concat fills a column only some of them
+    have with NaN, which can fail the batch and defeat the coalescing.
+
+    The stages timed while scoring a batch (on the worker thread) are
+    added to every caller's request timings, so they show up in its
+    Server-Timing header.
+    """
+
+    def __init__(self, score, max_rows=8192, max_wait=0.0):
+        self.score = score
+        self.max_rows = max_rows
+        self.max_wait = max_wait
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.worker = None
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+
+    def submit(self, df):
+        """
+        Scores ``df`` together with whatever else is queued.
+
+        Returns:
+            tuple: (results for df's rows, rows in the combined batch)
+        """
+        self._start()
+        pending = PendingBatch(df)
+        self.queue.put(pending)
+        pending.done.wait()
+        metrics.add_to_request(pending.timings)
+        if pending.error is not None:
+            raise pending.error
+        return pending.result, pending.batch_rows
+
+    def _start(self):
+        with self.lock:
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self.worker.start()
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        rows = len(batch[0].df)
+        # 等待時間從最早的請求進入佇列起算，忙碌時不會再多等
+        deadline = batch[0].queued_at + self.max_wait
+        while rows < self.max_rows:
+            timeout = deadline - time.monotonic()
+            try:
+                pending = self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(pending)
+            rows += len(pending.df)
+        return batch
+
+    def _run(self):
+        while True:
+            self._score(self._collect())
+
+    def _score(self, batch):
+        rows = sum(len(pending.df) for pending in batch)
+        # 在背景執行緒上收集本批次的各階段耗時，交給每個呼叫者
+        token, timings = metrics.begin_request()
+        try:
+            df = batch[0].df if len(batch) == 1 else pd.concat([p.df for p in batch], ignore_index=True)
+            with metrics.stage('micro_batch', rows=rows):
+                results = self.score(df)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].finish(error=e, timings=timings)
+                return
+            # 合併批次失敗時逐一重試，找出有問題的請求
+            for pending in batch:
+                self._score([pending])
+            return
+        finally:
+            metrics.end_request(token)
+
+        with self.lock:
+            self.batches += 1
+            self.requests += len(batch)
+            self.rows += rows
+        offsets = np.cumsum([0] + [len(pending.df) for pending in batch])
+        for pending, start, end in zip(batch, offsets[:-1], offsets[1:]):
+            pending.finish(tuple(values[start:end] for values in results), batch_rows=rows, timings=timings)
+
+    def info(self):
+        with self.lock:
+            return {
+                'batches': self.batches,
+                'requests': self.requests,
+                'rows': self.rows,
+                'meanBatchRows': self.rows / self.batches if self.batches else 0.0,
+                'maxRows': self.max_rows,
+                'maxWaitMs': self.max_wait * 1000,
+                'queued': self.queue.qsize(),
+            }
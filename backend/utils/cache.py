@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'predictions')
+
+
+class PredictionCache:
+    """
+    Caches prediction arrays (and other JSON-serializable results) per
+    input file content and model version.
+
+    Keys combine the SHA-256 of the input file with the model's version
+    hash, so identical re-uploads hit and a changed model file misses
+    without explicit invalidation. Values live in an in-memory LRU of
+    ``max_entries`` and on disk under ``directory`` (``.npy`` for arrays,
+    ``.json`` otherwise), where the oldest files beyond ``max_disk_entries``
+    are removed.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_entries=32, max_disk_entries=256):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.entries = OrderedDict()
+        self.hashes = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def content_hash(self, path):
+        """SHA-256 of a file, memoized on its mtime and size."""
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self.hashes.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        self.hashes[path] = (signature, digest.hexdigest())
+        return digest.hexdigest()
+
+    def key(self, kind, paths, version):
+        """Cache key for ``kind`` computed from the files in ``paths`` with a model ``version``."""
+        digest = hashlib.sha256(f"{kind}:{version}".encode())
+        for path in paths:
+            digest.update(self.content_hash(path).encode())
+        return f"{kind}-{digest.hexdigest()[:32]}"
+
+    def _disk_paths(self, key):
+        return os.path.join(self.directory, f"{key}.npy"), os.path.join(self.directory, f"{key}.json")
+
+    def _remember(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+
+        array_path, json_path = self._disk_paths(key)
+        value = None
+        try:
+            if os.path.exists(array_path):
+                value = np.load(array_path)
+            elif os.path.exists(json_path):
+                with open(json_path) as f:
+                    value = json.load(f)
+        except (OSError, ValueError):
+            # 損壞的快取檔視為未命中
+            value = None
+
+        with self.lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        os.makedirs(self.directory, exist_ok=True)
+        array_path, json_path = self._disk_paths(key)
+        path = array_path if isinstance(value, np.ndarray) else json_path
+        # 每個執行緒各自寫暫存檔再改名，讀取端不會看到寫到一半的檔案
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if isinstance(value, np.ndarray):
+            with open(tmp_path, 'wb') as f:
+                np.save(f, value)
+        else:
+            with open(tmp_path, 'w') as f:
+                json.dump(value, f)
+        os.replace(tmp_path, path)
+        self._remember(key, value)
+        self._prune()
+
+    def _prune(self):
+        names = [name for name in os.listdir(self.directory) if name.endswith(('.npy', '.json'))]
+        if len(names) <= self.max_disk_entries:
+            return
+        paths = sorted((os.path.join(self.directory, name) for name in names), key=os.path.getmtime)
+        for path in paths[:len(paths) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def info(self):
+        return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
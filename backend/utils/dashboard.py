@@ -0,0 +1,329 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.preprocess import DATE_COLUMNS, DATE_FORMAT
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SUMMARY_DIR = os.path.join(BACKEND_DIR, 'Dashboard_summary')
+
+# Dimensions the risk cube is grouped by; 'Order Month' is derived from the order date
+DIMENSIONS = ('Category Name', 'Market', 'Order Region', 'Shipping Mode', 'Customer Segment', 'Order Month')
+MONTH_DIMENSION = 'Order Month'
+
+# Raw upload columns the summary and the cube need
+SUMMARY_COLUMNS = ['Order Id', 'Order Item Id', *DIMENSIONS[:-1], DATE_COLUMNS['Order']]
+
+LATE_THRESHOLD = 0.5
+# Risk histogram resolution: thresholds at multiples of 1 / RISK_BINS are a
+# column lookup, others also count the rows of one bin
+RISK_BINS = 100
+
+
+def summary_path(file_name):
+    return os.path.join(SUMMARY_DIR, f"{file_name}_summary.json")
+
+
+def cube_path(file_name):
+    return os.path.join(SUMMARY_DIR, f"{file_name}_cube.npz")
+
+
+def sorted_lookup(keys, values, query):
+    """
+    values[k] for the position k of each query in keys, NaN where a query
+    is absent. keys must be unique; they are sorted once and probed with
+    searchsorted instead of a hash merge.
+    """
+    keys = np.asarray(keys)
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    sorted_values = np.asarray(values, dtype=np.float64)[order]
+
+    query = np.asarray(query)
+    position = np.searchsorted(sorted_keys, query).clip(max=max(len(sorted_keys) - 1, 0))
+    found = sorted_keys[position] == query if len(sorted_keys) else np.zeros(len(query), dtype=bool)
+    result = np.full(len(query), np.nan)
+    result[found] = sorted_values[position[found]]
+    return result
+
+
+def risk_per_row(raw, predictions):
+    """
+    Predicted late-delivery probability for every raw upload row.
+
+    Item-level predictions are joined on 'Order Item Id' when both sides
+    have it, or taken positionally when they are in the upload's row
+    order. Otherwise each row gets its order's highest risk by
+    'Order Id', so multi-item orders are never counted more than once per
+    item.
+    """
+    if 'Order Item Id' in raw.columns and 'Order Item Id' in predictions.columns:
+        return sorted_lookup(predictions['Order Item Id'], predictions['PredictedValue'], raw['Order Item Id'])
+    if len(raw) == len(predictions) and np.array_equal(raw['Order Id'].to_numpy(), predictions['Order Id'].to_numpy()):
+        return predictions['PredictedValue'].to_numpy(dtype=np.float64)
+    per_order = predictions.groupby('Order Id', sort=False)['PredictedValue'].max()
+    return sorted_lookup(per_order.index.to_numpy(), per_order.to_numpy(), raw['Order Id'])
+
+
+def dimension_codes(raw, dimension):
+    """
+    Sorted labels of one cube dimension and each raw row's position in
+    them (-1 where the row has no value).
+
+    Returns:
+        tuple: (codes, labels)
+    """
+    if dimension == MONTH_DIMENSION:
+        stamps = pd.to_datetime(raw[DATE_COLUMNS['Order']], format=DATE_FORMAT, errors='coerce')
+        months = stamps.to_numpy(dtype='datetime64[M]')
+        missing = np.isnat(months)
+        uniques = np.unique(months[~missing])
+        codes = np.searchsorted(uniques, months)
+        codes[missing] = -1
+        # 只格式化不重複的月份，不必逐列轉字串
+        return codes, np.datetime_as_string(uniques, unit='M')
+    codes, labels = pd.factorize(raw[dimension], sort=True)
+    return codes, np.asarray(labels, dtype=str)
+
+
+class RiskCube:
+    """
+    Pre-bucketed risk histograms per dimension value, so the delay rate of
+    any dimension at any threshold is a column lookup instead of a
+    regrouping of the upload.
+
+    For every dimension the cube holds, per value, the row count and the
+    number of rows with risk above each edge k / bins (k = 0..bins). It
+    also keeps the rows' risk in ascending order with their value codes,
+    so a threshold between two edges is answered exactly: the count at the
+    lower edge minus the rows of that one bin at or below the threshold.
+    Rows without a prediction count as not late, like in the summary.
+    """
+
+    def __init__(self, tables, risk, bins=RISK_BINS):
+        # tables: {dimension: (labels, rows, late, codes)}, late[:, k] = rows with risk > k / bins,
+        # codes = value position of every row in ascending risk order (None for the whole upload)
+        self.tables = tables
+        self.risk = risk
+        self.bins = bins
+
+    @classmethod
+    def build(cls, raw, risk, dimensions=DIMENSIONS, bins=RISK_BINS):
+        """
+        Args:
+            raw (pd.DataFrame): Uploaded rows with the dimension columns.
+            risk (np.ndarray): Predicted late-delivery probability per row.
+            dimensions (iterable): Dimensions to bucket; ones the upload
+                lacks are skipped.
+            bins (int): Histogram bins over [0, 1].
+        """
+        edges = np.arange(bins + 1) / bins
+        # 第 i 格為 edges[i-1] < risk <= edges[i]；沒有預測值的列視為 0，放在第 0 格，永遠不算延遲
+        risk = np.nan_to_num(np.asarray(risk, dtype=np.float64), nan=0.0)
+        bucket = np.searchsorted(edges, risk, side='left').clip(max=bins + 1)
+        width = bins + 2
+        order = np.argsort(risk, kind='stable')
+
+        zeros = np.zeros(len(bucket), dtype=np.int64)
+        tables = {'': cls._table(zeros, np.array(['all']), bucket, width) + (None,)}
+        for dimension in dimensions:
+            if dimension != MONTH_DIMENSION and dimension not in raw.columns:
+                continue
+            if dimension == MONTH_DIMENSION and DATE_COLUMNS['Order'] not in raw.columns:
+                continue
+            codes, labels = dimension_codes(raw, dimension)
+            tables[dimension] = cls._table(codes, labels, bucket, width) + (codes[order].astype(np.int32),)
+        return cls(tables, risk[order], bins)
+
+    @staticmethod
+    def _table(codes, labels, bucket, width):
+        known = codes >= 0
+        counts = np.bincount(codes[known] * width + bucket[known], minlength=len(labels) * width)
+        counts = counts.reshape(len(labels), width)
+        # late[:, k] = 第 k+1 格以後的列數，也就是 risk > edges[k]
+        late = counts[:, ::-1].cumsum(axis=1)[:, ::-1][:, 1:]
+        return labels, counts.sum(axis=1), late.astype(np.int64)
+
+    @property
+    def dimensions(self):
+        return [dimension for dimension in self.tables if dimension]
+
+    def edge(self, threshold):
+        """Index of the highest histogram edge at or below a threshold in [0, 1]."""
+        threshold = float(threshold)
+        if not 0.0 <= threshold <= 1.0:
+            raise ValueError(f"Threshold must be between 0 and 1, got {threshold}")
+        k = int(np.floor(threshold * self.bins))
+        # 以邊界值本身比較，避免 0.29 * 100 = 28.999... 之類的浮點誤差
+        if k < self.bins and (k + 1) / self.bins <= threshold:
+            k += 1
+        elif k / self.bins > threshold:
+            k -= 1
+        return k
+
+    def _late(self, dimension, threshold):
+        labels, rows, late, codes = self.tables[dimension]
+        k = self.edge(threshold)
+        counts = late[:, k]
+        threshold = float(threshold)
+        if k / self.bins < threshold:
+            # 門檻落在兩個邊界之間：扣掉該格內 risk <= threshold 的列
+            low = np.searchsorted(self.risk, k / self.bins, side='right')
+            high = np.searchsorted(self.risk, threshold, side='right')
+            if codes is None:
+                counts = counts - (high - low)
+            else:
+                between = codes[low:high]
+                counts = counts - np.bincount(between[between >= 0], minlength=len(labels))
+        return labels, counts, rows
+
+    def late(self, dimension, threshold=LATE_THRESHOLD):
+        """
+        Late (risk above ``threshold``) and total row counts per value of
+        ``dimension``.
+
+        Returns:
+            tuple: (labels, late counts, row counts, threshold)
+        """
+        if dimension not in self.tables or not dimension:
+            raise KeyError(dimension)
+        labels, late, rows = self._late(dimension, threshold)
+        return labels, late, rows, float(threshold)
+
+    def delay_rate(self, dimension, threshold=LATE_THRESHOLD):
+        """{value: share of rows with risk above threshold} for one dimension."""
+        labels, late, rows, _ = self.late(dimension, threshold)
+        return dict(zip(labels.tolist(), (late / rows).tolist()))
+
+    def overview(self, threshold=LATE_THRESHOLD):
+        """Late and on-time row counts of the whole upload."""
+        _, late, rows = self._late('', threshold)
+        count = int(late[0])
+        return {'Late': count, 'On Time': int(rows[0]) - count}
+
+    def to_arrays(self):
+        arrays = {'bins': np.array(self.bins), 'dimensions': np.array(list(self.tables), dtype=str),
+                  'risk': self.risk}
+        for k, (labels, rows, late, codes) in enumerate(self.tables.values()):
+            arrays.update({f'labels_{k}': labels, f'rows_{k}': rows, f'late_{k}': late})
+            if codes is not None:
+                arrays[f'codes_{k}'] = codes
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        tables = {
+            str(dimension): (arrays[f'labels_{k}'], arrays[f'rows_{k}'], arrays[f'late_{k}'],
+                             arrays[f'codes_{k}'] if dimension else None)
+            for k, dimension in enumerate(arrays['dimensions'])
+        }
+        return cls(tables, arrays['risk'], int(arrays['bins']))
+
+
+def build_summary(cube, feature_importances, feature_names, top=10):
+    """
+    Dashboard aggregates: delay rate by category, late/on-time counts and
+    the top feature importances, read from a RiskCube.
+    """
+    # 1. Delays by Category
+    delay_by_category = (
+        pd.Series(cube.delay_rate('Category Name', LATE_THRESHOLD))
+        .sort_values(ascending=False)
+        .round(2)
+    )
+
+    # 2. Shipment Delay Overview
+    shipment_overview = cube.overview(LATE_THRESHOLD)
+
+    # 3. Top feature importances
+    top_features = pd.Series(feature_importances, index=feature_names).sort_values(ascending=False).head(top)
+
+    return {
+        'delayByCategory': {str(k): float(v) for k, v in delay_by_category.items()},
+        'shipmentOverview': shipment_overview,
+        'featureImportance': {str(k): float(v) for k, v in top_features.items()}
+    }
+
+
+def _signature(sources, version):
+    return {'sources': {path: os.stat(path).st_mtime_ns for path in sources}, 'modelVersion': version}
+
+
+def save_summary(file_name, summary, sources, version):
+    """Stores the summary with the source files' mtimes and the model version it came from."""
+    os.makedirs(SUMMARY_DIR, exist_ok=True)
+    path = summary_path(file_name)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({**_signature(sources, version), 'summary': summary}, f)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_summary(file_name, sources, version):
+    """The stored summary, or None if it is missing or older than its sources or model."""
+    try:
+        with open(summary_path(file_name)) as f:
+            stored = json.load(f)
+        current = _signature(sources, version)
+    except (OSError, ValueError):
+        return None
+    if stored.get('sources') != current['sources'] or stored.get('modelVersion') != version:
+        return None
+    return stored['summary']
+
+
+class CubeStore:
+    """
+    Risk cubes per upload, kept in memory (LRU of ``max_entries``) and
+    stored next to the summary, both validated against the source files'
+    mtimes and the model version.
+    """
+
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, file_name, sources, version, build, refresh=False):
+        """The current cube of an upload, calling ``build()`` when none is fresh."""
+        signature = _signature(sources, version)
+        cube = None
+        if not refresh:
+            with self.lock:
+                entry = self.entries.get(file_name)
+                if entry is not None and entry[0] == signature:
+                    self.entries.move_to_end(file_name)
+                    return entry[1]
+            cube = self._load(file_name, signature)
+
+        if cube is None:
+            cube = build()
+            self._save(file_name, cube, signature)
+        with self.lock:
+            self.entries[file_name] = (signature, cube)
+            self.entries.move_to_end(file_name)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return cube
+
+    def _load(self, file_name, signature):
+        try:
+            with np.load(cube_path(file_name)) as arrays:
+                if json.loads(str(arrays['signature'])) != signature:
+                    return None
+                return RiskCube.from_arrays(arrays)
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _save(self, file_name, cube, signature):
+        os.makedirs(SUMMARY_DIR, exist_ok=True)
+        path = cube_path(file_name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, signature=np.array(json.dumps(signature)), **cube.to_arrays())
+        os.replace(tmp_path, path)
@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+from sklearn.impute import SimpleImputer
+from sklearn.preprocessing import RobustScaler
+
+from utils.metrics import metrics
+
+# Rows densified at a time when scoring a sparse feature matrix
+DENSE_BLOCK_ROWS = 16_384
+
+
+def _same_value(a, b):
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        a, b = np.asarray(a), np.asarray(b)
+        if a.shape != b.shape or a.dtype.kind != b.dtype.kind:
+            return False
+        return np.array_equal(a, b, equal_nan=a.dtype.kind == 'f')
+    if isinstance(a, float) and isinstance(b, float) and np.isnan(a) and np.isnan(b):
+        return True
+    return bool(a == b)
+
+
+def _same_state(a, b):
+    return a.keys() == b.keys() and all(_same_value(a[key], b[key]) for key in a)
+
+
+def same_preprocessing(first, second):
+    """
+    True when two pipelines' preprocessing steps (everything before the
+    final estimator) have the same types, parameters and fitted state, so
+    one transformed matrix can feed both estimators.
+    """
+    if isinstance(first, CompiledPipeline):
+        return first.same_transform(second)
+    steps_a, steps_b = first[:-1].steps, second[:-1].steps
+    if len(steps_a) != len(steps_b):
+        return False
+    for (_, a), (_, b) in zip(steps_a, steps_b):
+        if type(a) is not type(b) or not _same_state(a.get_params(), b.get_params()):
+            return False
+        fitted_a = {key: value for key, value in vars(a).items() if key.endswith('_')}
+        fitted_b = {key: value for key, value in vars(b).items() if key.endswith('_')}
+        if not _same_state(fitted_a, fitted_b):
+            return False
+    return True
+
+
+def _work_dtype(X):
+    """Float dtype sklearn's check_array would convert X to."""
+    dtypes = X.dtypes if isinstance(X, pd.DataFrame) else [X.dtype]
+    if all(isinstance(dtype, np.dtype) for dtype in dtypes):
+        dtype = np.result_type(*dtypes)
+        if dtype in (np.float32, np.float64):
+            return dtype
+    return np.dtype(np.float64)
+
+
+class CompiledPipeline:
+    """
+    A fitted SimpleImputer → RobustScaler → XGBoost pipeline as one NumPy
+    transform plus the booster's inplace_predict.
+
+    The imputer's statistics are folded through the scaler into one fill
+    row, so a block is centered and scaled in place and its missing
+    entries are then overwritten with the fill. The arithmetic is the
+    same per element and in the same float dtype as the sklearn steps, so
+    predictions are identical to ``pipeline.predict``/``predict_proba``,
+    without the steps' validation and intermediate copies. Rows are
+    processed in blocks of ``block_rows`` to bound memory.
+
+    Raises ValueError for pipelines of any other shape.
+    """
+
+    def __init__(self, pipeline, n_threads=None, block_rows=DENSE_BLOCK_ROWS):
+        steps = [step for _, step in pipeline.steps]
+        if len(steps) != 3 or not isinstance(steps[0], SimpleImputer) or not isinstance(steps[1], RobustScaler):
+            raise ValueError("Only SimpleImputer → RobustScaler → XGBoost pipelines can be compiled")
+        imputer, scaler, model = steps
+        if imputer.add_indicator or not (isinstance(imputer.missing_values, float) and np.isnan(imputer.missing_values)):
+            raise ValueError("Only NaN imputation without indicator columns can be compiled")
+        if np.isnan(imputer.statistics_).any():
+            raise ValueError("Imputer drops empty features; cannot compile")
+
+        width = len(imputer.statistics_)
+        self.statistics = imputer.statistics_
+        self.center = scaler.center_ if scaler.with_centering else np.zeros(width)
+        self.scale = scaler.scale_ if scaler.with_scaling else np.ones(width)
+        self.feature_names = list(getattr(pipeline, 'feature_names_in_', [])) or None
+        self.block_rows = block_rows
+        self.fills = {}
+
+        self.booster = model.get_booster().copy()
+        if n_threads:
+            self.booster.set_param({'nthread': int(n_threads)})
+        self.missing = model.missing
+        best_iteration = getattr(model, 'best_iteration', None)
+        self.iteration_range = (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+
+    def _fill(self, dtype):
+        # 缺值以「中位數經過同樣平移與縮放」後的值填入
+        if dtype not in self.fills:
+            fill = self.statistics.astype(dtype)
+            fill -= self.center
+            fill /= self.scale
+            self.fills[dtype] = fill
+        return self.fills[dtype]
+
+    def same_transform(self, other):
+        return all(np.array_equal(a, b) for a, b in ((self.statistics, other.statistics),
+                                                     (self.center, other.center),
+                                                     (self.scale, other.scale)))
+
+    def blocks(self, X):
+        """Yields the model input of X as float32 C-contiguous row blocks."""
+        if isinstance(X, pd.DataFrame) and self.feature_names is not None and list(X.columns) != self.feature_names:
+            X = X[self.feature_names]
+        dtype = _work_dtype(X)
+        fill = self._fill(dtype)
+        for start in range(0, len(X), self.block_rows):
+            block = X.iloc[start:start + self.block_rows] if isinstance(X, pd.DataFrame) else X[start:start + self.block_rows]
+            if isinstance(block, pd.DataFrame):
+                block = block.to_numpy(dtype=dtype, na_value=np.nan, copy=True)
+            else:
+                block = np.array(block, dtype=dtype)
+            missing = np.isnan(block)
+            block -= self.center
+            block /= self.scale
+            np.copyto(block, fill, where=missing)
+            # 先沿原本的記憶體順序轉成 float32，再以一半的位元組轉為列優先
+            yield np.ascontiguousarray(block.astype(np.float32, order='K'))
+
+    def predict_blocks(self, blocks):
+        values = [self.booster.inplace_predict(block, iteration_range=self.iteration_range, missing=self.missing,
+                                               validate_features=False) for block in blocks]
+        return np.concatenate(values) if values else np.empty(0, dtype=np.float32)
+
+    def predict(self, X):
+        """Predicted value per row; the positive-class probability for binary classifiers."""
+        return self.predict_blocks(self.blocks(X))
+
+    def predict_proba(self, X):
+        """(n, 2) class probabilities of a binary classifier, as XGBClassifier.predict_proba."""
+        positive = self.predict(X)
+        return np.vstack((1.0 - positive, positive)).transpose()
+
+
+def score_compiled(df, classifier, regressor):
+    """score_features for two CompiledPipelines, transforming once when they share preprocessing."""
+    shared = classifier.same_transform(regressor)
+    with metrics.stage('predict', rows=len(df)):
+        if shared:
+            blocks = list(classifier.blocks(df))
+            risk = classifier.predict_blocks(blocks)
+            days = regressor.predict_blocks(blocks)
+        else:
+            risk = classifier.predict(df)
+            days = regressor.predict(df)
+    return risk, days, shared
+
+
+def score_features(df, classifier, regressor):
+    """
+    Runs the delay classifier and the shipping-days regressor on one
+    processed feature frame.
+
+    The features are imputed and scaled once when both pipelines were
+    fitted with identical preprocessing; otherwise each pipeline applies
+    its own.
+
+    Returns:
+        tuple: (late-delivery probability, predicted shipping days, whether
+            preprocessing was shared)
+    """
+    if isinstance(classifier, CompiledPipeline):
+        return score_compiled(df, classifier, regressor)
+    shared = same_preprocessing(classifier, regressor)
+    with metrics.stage('predict', rows=len(df)):
+        features = classifier[:-1].transform(df)
+        risk = classifier[-1].predict_proba(features)[:, 1]
+        if not shared:
+            features = regressor[:-1].transform(df)
+        days = regressor[-1].predict(features)
+    return risk, days, shared
+
+
+def iter_dense_blocks(matrix, columns, block_rows=DENSE_BLOCK_ROWS):
+    """Yields consecutive row blocks of a sparse matrix as dense DataFrames."""
+    for start in range(0, matrix.shape[0], block_rows):
+        yield pd.DataFrame(matrix[start:start + block_rows].toarray(), columns=columns)
+
+
+def score_sparse(matrix, columns, classifier, regressor, block_rows=DENSE_BLOCK_ROWS):
+    """
+    score_features for a sparse feature matrix from preprocess_to_sparse.
+
+    The matrix is densified one row block at a time rather than handed to
+    the pipelines as CSR: XGBoost treats entries absent from a sparse
+    matrix as missing, not as zero, and RobustScaler cannot center sparse
+    input, so either would change the predictions. Peak memory is bounded
+    by ``block_rows`` instead of the full dense frame.
+    """
+    risk, days, shared = [], [], False
+    for block in iter_dense_blocks(matrix, columns, block_rows):
+        block_risk, block_days, shared = score_features(block, classifier, regressor)
+        risk.append(block_risk)
+        days.append(block_days)
+    return np.concatenate(risk), np.concatenate(days), shared
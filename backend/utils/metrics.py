@@ -0,0 +1,209 @@
+import contextvars
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Histogram buckets (seconds) for stage latencies
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Stage timings of the current request, for the Server-Timing header
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far, or None without the resource module."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 回報 KiB，macOS 回報 bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class StageStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.row_seconds = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.peak_rss = 0
+        self.rss_growth = 0
+
+    def observe(self, seconds, rows=None, peak_before=None, peak_after=None, failed=False):
+        self.calls += 1
+        self.errors += failed
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        if rows is not None:
+            self.rows += rows
+            self.row_seconds += seconds
+        for k, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[k] += 1
+        if peak_after is not None:
+            self.peak_rss = max(self.peak_rss, peak_after)
+            # 峰值 RSS 只會增加；增加量代表此階段推高了行程的記憶體峰值
+            self.rss_growth = max(self.rss_growth, peak_after - peak_before)
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.row_seconds if self.row_seconds > 0 else 0.0
+
+
+class StageTimer:
+    """Handle of a running stage; set ``rows`` to report throughput."""
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+        self.seconds = None
+
+
+class Metrics:
+    """
+    Per-stage latency, throughput and memory of the upload → predict →
+    dashboard → optimize pipeline.
+
+    Stages are timed with ``stage(name, rows)``; each records its latency
+    histogram, total rows (for rows/sec) and the process's peak RSS at the
+    end of the stage. ``render()`` returns everything in the Prometheus
+    text exposition format; stages run between ``begin_request()`` and
+    ``end_request()`` are also collected for a Server-Timing header.
+    """
+
+    def __init__(self, prefix='supply_chain'):
+        self.prefix = prefix
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def observe(self, name, seconds, rows=None, peak_before=None, peak_after=None, failed=False):
+        with self.lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = StageStats()
+            stats.observe(seconds, rows, peak_before, peak_after, failed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, seconds))
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        timer = StageTimer(name, rows)
+        peak_before = peak_rss_bytes()
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield timer
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            timer.seconds = time.perf_counter() - start
+            self.observe(name, timer.seconds, timer.rows, peak_before, peak_rss_bytes(), failed)
+
+    def timed(self, name, iterable, rows=len):
+        """
+        Yields from ``iterable``, timing each step (e.g. reading the next
+        CSV chunk) as stage ``name``; ``rows(item)`` counts its rows.
+        """
+        iterator = iter(iterable)
+        while True:
+            peak_before = peak_rss_bytes()
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                # 讀到結尾的那一步不算一次階段
+                return
+            except BaseException:
+                self.observe(name, time.perf_counter() - start, None, peak_before, peak_rss_bytes(), failed=True)
+                raise
+            self.observe(name, time.perf_counter() - start, rows(item) if rows is not None else None,
+                         peak_before, peak_rss_bytes())
+            yield item
+
+    def begin_request(self):
+        """
+        Starts collecting the (stage, seconds) pairs of the current request.
+
+        Returns:
+            tuple: (token for end_request, list of timings filled in place)
+        """
+        timings = []
+        return _request_timings.set(timings), timings
+
+    def end_request(self, token):
+        _request_timings.reset(token)
+
+    def add_to_request(self, timings):
+        """
+        Adds (stage, seconds) pairs timed on another thread (e.g. a shared
+        micro-batch) to the current request's Server-Timing, without
+        counting them in the stage statistics a second time.
+        """
+        current = _request_timings.get()
+        if current is not None:
+            current.extend(timings)
+
+    def render(self):
+        with self.lock:
+            stages = sorted(self.stages.items())
+            lines = []
+
+            def family(name, kind, help_text):
+                lines.append(f"# HELP {self.prefix}_{name} {help_text}")
+                lines.append(f"# TYPE {self.prefix}_{name} {kind}")
+
+            family('stage_seconds', 'histogram', 'Latency of each pipeline stage.')
+            for name, stats in stages:
+                label = _label(name)
+                for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                    lines.append(f'{self.prefix}_stage_seconds_bucket{{stage="{label}",le="{bound}"}} {count}')
+                lines.append(f'{self.prefix}_stage_seconds_bucket{{stage="{label}",le="+Inf"}} {stats.calls}')
+                lines.append(f'{self.prefix}_stage_seconds_sum{{stage="{label}"}} {stats.seconds:.6f}')
+                lines.append(f'{self.prefix}_stage_seconds_count{{stage="{label}"}} {stats.calls}')
+
+            simple = [
+                ('stage_seconds_max', 'gauge', 'Slowest run of each stage.', lambda s: f'{s.max_seconds:.6f}'),
+                ('stage_errors_total', 'counter', 'Stage runs that raised.', lambda s: s.errors),
+                ('stage_rows_total', 'counter', 'Rows processed by each stage.', lambda s: s.rows),
+                ('stage_rows_per_second', 'gauge', 'Average rows per second of each stage.',
+                 lambda s: f'{s.rows_per_second:.1f}'),
+                ('stage_peak_rss_bytes', 'gauge', 'Process peak RSS at the end of each stage.', lambda s: s.peak_rss),
+                ('stage_rss_growth_bytes', 'gauge', 'Largest rise of the process peak RSS during one run of each stage.',
+                 lambda s: s.rss_growth),
+            ]
+            for name, kind, help_text, value in simple:
+                family(name, kind, help_text)
+                for stage, stats in stages:
+                    lines.append(f'{self.prefix}_{name}{{stage="{_label(stage)}"}} {value(stats)}')
+
+        peak = peak_rss_bytes()
+        if peak is not None:
+            family('process_peak_rss_bytes', 'gauge', 'Peak resident set size of the process.')
+            lines.append(f'{self.prefix}_process_peak_rss_bytes {peak}')
+        return '\n'.join(lines) + '\n'
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def server_timing(timings):
+    """Server-Timing header value for (stage, seconds) pairs; repeated stages are summed."""
+    totals = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ', '.join(f'{name};dur={seconds * 1000:.1f}' for name, seconds in totals.items())
+
+
+# Process-wide registry used by the app and the utils modules
+metrics = Metrics()
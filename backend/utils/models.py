@@ -0,0 +1,117 @@
+import hashlib
+import os
+import threading
+import time
+
+import joblib
+
+from utils.metrics import metrics
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'model')
+
+MODEL_PATHS = {
+    'classification': os.path.join(MODEL_DIR, 'delay_prediction_pipeline.joblib'),
+    'regression': os.path.join(MODEL_DIR, 'shipping_real_regression_pipeline.joblib'),
+    'encoder': os.path.join(MODEL_DIR, 'one_hot_encoder.joblib'),
+}
+
+
+def file_version(path):
+    """Short content hash of a model file, stable across restarts."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+class LoadedModel:
+    def __init__(self, obj, path, stat, load_seconds):
+        self.obj = obj
+        self.path = path
+        self.signature = (stat.st_mtime_ns, stat.st_size)
+        self.version = file_version(path)
+        self.loaded_at = time.time()
+        self.load_seconds = load_seconds
+
+
+class ModelRegistry:
+    """
+    Loads each model file once and hands out the same object to every
+    request.
+
+    Large NumPy arrays are memory-mapped (joblib ``mmap_mode``) instead of
+    copied. Files are re-checked at most every ``check_interval`` seconds
+    and reloaded when their mtime or size changes; if a reload fails the
+    previous model keeps serving.
+    """
+
+    def __init__(self, paths, mmap_mode='r', check_interval=2.0):
+        self.paths = dict(paths)
+        self.mmap_mode = mmap_mode
+        self.check_interval = check_interval
+        self.loaded = {}
+        self.checked_at = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+
+    def _load(self, name):
+        path = self.paths[name]
+        stat = os.stat(path)
+        start = time.perf_counter()
+        with metrics.stage('model_load'):
+            obj = joblib.load(path, mmap_mode=self.mmap_mode)
+        self.loaded[name] = LoadedModel(obj, path, stat, time.perf_counter() - start)
+        self.errors.pop(name, None)
+        print(f"Loaded model '{name}' version {self.loaded[name].version} from {path}")
+
+    def _refresh(self, name):
+        now = time.monotonic()
+        current = self.loaded.get(name)
+        if current is not None and now - self.checked_at.get(name, 0) < self.check_interval:
+            return
+        self.checked_at[name] = now
+        try:
+            stat = os.stat(self.paths[name])
+            if current is None or (stat.st_mtime_ns, stat.st_size) != current.signature:
+                self._load(name)
+        except Exception as e:
+            self.errors[name] = str(e)
+            if current is None:
+                raise
+
+    def entry(self, name):
+        if name not in self.paths:
+            raise KeyError(f"Unknown model '{name}'")
+        with self.lock:
+            self._refresh(name)
+            return self.loaded[name]
+
+    def get(self, name):
+        return self.entry(name).obj
+
+    def version(self, name):
+        return self.entry(name).version
+
+    def load_all(self):
+        """Eagerly loads every model; failures are recorded, not raised."""
+        for name in self.paths:
+            try:
+                self.entry(name)
+            except Exception as e:
+                print(f"Failed to load model '{name}': {e}")
+
+    def info(self):
+        with self.lock:
+            info = {}
+            for name, path in self.paths.items():
+                loaded = self.loaded.get(name)
+                info[name] = {
+                    'path': path,
+                    'loaded': loaded is not None,
+                    'version': loaded.version if loaded else None,
+                    'loaded_at': loaded.loaded_at if loaded else None,
+                    'load_seconds': loaded.load_seconds if loaded else None,
+                    'error': self.errors.get(name),
+                }
+            return info
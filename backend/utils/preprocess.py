@@ -1,8 +1,262 @@
-import pandas as pd
+import copy
+
 import joblib
-import os
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from utils.metrics import metrics
+from utils.storage import FrameWriter, downcast
+
+# Columns the models were never trained on
+DROP_COLUMNS = [
+    "Customer Id", "Customer Password", "Customer Fname", "Customer Lname",
+    "Customer Email", "Product Image", "Customer Street", "Order City",
+    "Order State", "Order Zipcode", "Product Description",
+    "Late_delivery_risk", "Delivery Status", "Days for shipping (real)"
+]
+
+# Narrow read dtypes for the DataCo columns the models use. Order and item
+# IDs are row keys and stay plain int32; the other integer features are
+# nullable Int32, so a blank cell reaches the imputer as <NA> instead of
+# failing the read. Coordinates stay float64 for the map preview.
+# DROP_COLUMNS (labels, names, e-mail, street) keep pandas' default
+# inference, so a blank label on new orders is never an error.
+UPLOAD_DTYPES = {
+    **{column: 'int32' for column in ['Order Id', 'Order Item Id']},
+    **{column: 'Int32' for column in [
+        'Days for shipment (scheduled)', 'Category Id', 'Department Id', 'Order Customer Id',
+        'Order Item Cardprod Id', 'Order Item Quantity', 'Product Card Id', 'Product Category Id',
+        'Product Status',
+    ]},
+    **{column: 'float32' for column in [
+        'Benefit per order', 'Sales per customer', 'Customer Zipcode', 'Order Item Discount',
+        'Order Item Discount Rate', 'Order Item Product Price', 'Order Item Profit Ratio',
+        'Sales', 'Order Item Total', 'Order Profit Per Order', 'Product Price',
+    ]},
+    **{column: 'category' for column in [
+        'Type', 'Category Name', 'Customer City', 'Customer Country', 'Customer Segment',
+        'Customer State', 'Department Name', 'Market', 'Order Country', 'Order Region',
+        'Order Status', 'Product Name', 'Shipping Mode',
+    ]},
+}
+
+# DataCo timestamps look like '1/31/2018 22:56'
+DATE_FORMAT = '%m/%d/%Y %H:%M'
+DATE_COLUMNS = {
+    'Shipping': 'shipping date (DateOrders)',
+    'Order': 'order date (DateOrders)',
+}
+DATE_PARTS = {
+    'Year': np.int16,
+    'Month': np.int8,
+    'Day': np.int8,
+    'Hour': np.int8,
+    'Weekday': np.int8,
+}
+
+def encoded_columns(encoder, df=None):
+    """Categorical columns the encoder was fitted on, in fit order."""
+    if hasattr(encoder, 'feature_names_in_'):
+        return list(encoder.feature_names_in_)
+    return list(df.select_dtypes(include='object').columns)
+
+def read_upload(path, usecols=None, **kwargs):
+    """
+    pd.read_csv with UPLOAD_DTYPES, so order IDs are int32, other integer
+    features nullable Int32, amounts float32 and repeated labels pandas
+    categories. Extra keyword arguments (e.g.
+    chunksize) are passed through; whole-file reads are timed as the
+    'csv_parse' stage.
+    """
+    dtypes = UPLOAD_DTYPES if usecols is None else {c: UPLOAD_DTYPES[c] for c in usecols if c in UPLOAD_DTYPES}
+    if kwargs.get('chunksize') or kwargs.get('iterator'):
+        return pd.read_csv(path, usecols=usecols, dtype=dtypes, **kwargs)
+    with metrics.stage('csv_parse') as timer:
+        df = pd.read_csv(path, usecols=usecols, dtype=dtypes, **kwargs)
+        timer.rows = len(df)
+    return df
+
+def coerce_upload(df):
+    """
+    Applies UPLOAD_DTYPES to a frame built in memory (JSON records, an
+    Arrow batch), so it has the same dtypes as a read_upload frame.
+    Raises ValueError when a value does not fit its column's type.
+    """
+    dtypes = {column: dtype for column, dtype in UPLOAD_DTYPES.items() if column in df.columns}
+    try:
+        return df.astype(dtypes)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid column values: {e}") from e
+
+def parse_dates(values):
+    """
+    Parses timestamps with DATE_FORMAT in one vectorized pass. Values in
+    another format (e.g. ISO 8601 from the JSON API) fall back to per-value
+    format inference; time zones are dropped, keeping the local time.
+
+    Raises:
+        ValueError: If a non-blank value cannot be parsed either way.
+    """
+    values = pd.Series(values)
+    stamps = pd.to_datetime(values, format=DATE_FORMAT, errors='coerce')
+    positions = np.flatnonzero(stamps.isna().to_numpy())
+    failed = values.iloc[positions]
+    blank = (failed.isna() | failed.astype(str).str.strip().eq('')).to_numpy()
+    positions, failed = positions[~blank], failed[~blank]
+    if failed.empty:
+        return stamps
+
+    # 只有不符合 DATE_FORMAT 的值才逐一推斷格式
+    try:
+        inferred = pd.to_datetime(failed, format='mixed', errors='coerce')
+    except ValueError as e:
+        raise ValueError(f"Invalid timestamps in '{values.name}': {e}") from e
+    if inferred.dt.tz is not None:
+        inferred = inferred.dt.tz_localize(None)
+    if inferred.isna().any():
+        examples = failed[inferred.isna()].unique()[:3].tolist()
+        raise ValueError(f"Invalid timestamps in '{values.name}': {examples}")
+    stamps.iloc[positions] = inferred.to_numpy()
+    return stamps
+
+def date_parts(values, prefix):
+    """
+    Parses DataCo timestamps with parse_dates and splits them into year,
+    month, day, hour and weekday (Monday=0).
+
+    Parts are int16/int8 arrays; missing timestamps make them nullable
+    Int16/Int8 with <NA> there, for the models' imputer. Either way a part
+    keeps the same storage type across upload chunks.
+
+    Returns:
+        dict: {prefix + part name: array}
+
+    Raises:
+        ValueError: If a non-blank timestamp cannot be parsed.
+    """
+    stamps = parse_dates(values).to_numpy(dtype='datetime64[m]')
+    missing = np.isnat(stamps)
+    days = stamps.astype('datetime64[D]')
+    months = stamps.astype('datetime64[M]')
+    years = stamps.astype('datetime64[Y]')
+    raw = {
+        'Year': years.astype(np.int64) + 1970,
+        'Month': (months - years).astype(np.int64) + 1,
+        'Day': (days - months).astype(np.int64) + 1,
+        'Hour': (stamps - days).astype(np.int64) // 60,
+        # 1970-01-01 是星期四
+        'Weekday': (days.astype(np.int64) + 3) % 7,
+    }
 
-def preprocess_uploaded_dataframe(df: pd.DataFrame, encoder_path) -> pd.DataFrame:
+    parts = {}
+    for part, dtype in DATE_PARTS.items():
+        column = raw[part].astype(dtype)
+        if missing.any():
+            column = pd.arrays.IntegerArray(column, missing)
+        parts[prefix + part] = column
+    return parts
+
+class OrderPreprocessor:
+    """
+    Turns uploaded DataCo rows into the model feature matrix.
+
+    The preprocessor holds the fitted one-hot encoder and the exact feature
+    schema the models were trained on (``feature_names``, e.g. a pipeline's
+    ``feature_names_in_``), checks every input against it and always
+    returns the columns in that order. Inputs are never modified.
+    """
+
+    def __init__(self, encoder, feature_names=None):
+        self.encoder = encoder
+        self.categorical_columns = encoded_columns(encoder)
+        self.encoded_names = list(encoder.get_feature_names_out(self.categorical_columns))
+        self.date_names = [prefix + part for prefix in DATE_COLUMNS for part in DATE_PARTS]
+        self.feature_names = None
+        if feature_names is not None:
+            self._set_schema(list(feature_names))
+
+    def _set_schema(self, feature_names):
+        generated = set(self.date_names) | set(self.encoded_names)
+        present = set(feature_names)
+        missing = [name for name in self.date_names + self.encoded_names if name not in present]
+        if missing:
+            raise ValueError(f"Feature schema lacks encoder/date columns: {missing[:5]}")
+        self.feature_names = feature_names
+        self.numeric_columns = [name for name in feature_names if name not in generated]
+        natural = self.numeric_columns + self.date_names + self.encoded_names
+        index = {name: k for k, name in enumerate(natural)}
+        # 只有在訓練欄位順序與自然順序不同時才需要重排
+        self.order = None if natural == feature_names else np.array([index[name] for name in feature_names])
+
+    @property
+    def input_columns(self):
+        return self.numeric_columns + list(DATE_COLUMNS.values()) + self.categorical_columns
+
+    def fit(self, df):
+        """
+        Learns the numeric part of the schema from a raw frame: every
+        column except DROP_COLUMNS, the dates and the categorical columns,
+        in input order. Only needed without a trained model's schema.
+        """
+        skipped = set(DROP_COLUMNS) | set(DATE_COLUMNS.values()) | set(self.categorical_columns)
+        numeric = [column for column in df.columns if column not in skipped]
+        self._set_schema(numeric + self.date_names + self.encoded_names)
+        return self
+
+    def validate(self, df):
+        if self.feature_names is None:
+            raise ValueError("OrderPreprocessor has no feature schema; pass feature_names or call fit")
+        missing = [column for column in self.input_columns if column not in df.columns]
+        if missing:
+            raise ValueError(f"Missing columns: {missing}")
+
+    def _dates(self, df):
+        parts = {}
+        with metrics.stage('date_parse', rows=len(df)):
+            for prefix, column in DATE_COLUMNS.items():
+                parts.update(date_parts(df[column], prefix))
+        return parts
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Returns the feature frame, columns in ``feature_names`` order."""
+        self.validate(df)
+        index = pd.RangeIndex(len(df))
+        numeric = df[self.numeric_columns].set_axis(index)
+        dates = pd.DataFrame(self._dates(df), index=index)
+        with metrics.stage('encode', rows=len(df)):
+            encoded = self.encoder.transform(df[self.categorical_columns]).astype(np.float32, copy=False)
+        encoded = pd.DataFrame(encoded, columns=self.encoded_names, index=index)
+
+        features = pd.concat([numeric, dates, encoded], axis=1)
+        if self.order is not None:
+            features = features[self.feature_names]
+        return features
+
+    def transform_sparse(self, df: pd.DataFrame):
+        """
+        Sparse variant of transform: the one-hot block stays the encoder's
+        CSR output instead of hundreds of dense, mostly-zero columns.
+
+        Returns:
+            tuple: (scipy.sparse.csr_matrix of float32, list of column names)
+        """
+        self.validate(df)
+        # 複製一份 encoder 改為輸出稀疏矩陣，不影響共用的 encoder
+        sparse_encoder = copy.copy(self.encoder)
+        sparse_encoder.sparse_output = True
+        with metrics.stage('encode', rows=len(df)):
+            encoded = sparse_encoder.transform(df[self.categorical_columns])
+
+        numeric = df[self.numeric_columns].to_numpy(dtype=np.float32, na_value=np.nan)
+        dates = pd.DataFrame(self._dates(df)).to_numpy(dtype=np.float32, na_value=np.nan)
+        matrix = sp.hstack([sp.csr_matrix(numeric), sp.csr_matrix(dates), encoded], format='csr', dtype=np.float32)
+        if self.order is not None:
+            matrix = matrix[:, self.order]
+        return matrix, list(self.feature_names)
+
+def preprocess_uploaded_dataframe(df: pd.DataFrame, encoder_path=None, encoder=None, verbose=True,
+                                  feature_names=None) -> pd.DataFrame:
     """
     Preprocesses an uploaded DataFrame by dropping irrelevant columns
     and transforming 'shipping date (DateOrders)' and 'order date (DateOrders)'
@@ -10,51 +264,58 @@ def preprocess_uploaded_dataframe(df: pd.DataFrame, encoder_path) -> pd.DataFram
 
     Args:
         df (pd.DataFrame): The input DataFrame from the uploaded CSV.
+        encoder_path (str, optional): Path of the fitted one-hot encoder.
+        encoder (OneHotEncoder, optional): An already loaded encoder, used
+            instead of loading encoder_path.
+        verbose (bool): Print column and shape summaries.
+        feature_names (list, optional): The models' training feature
+            schema; learned from df when omitted.
 
     Returns:
         pd.DataFrame: The preprocessed DataFrame.
     """
-
-    # Drop clearly unnecessary columns upfront
-    df.drop(columns=[
-        "Customer Id", "Customer Password", "Customer Fname", "Customer Lname",
-        "Customer Email", "Product Image", "Customer Street", "Order City",
-        "Order State", "Order Zipcode", "Product Description",
-        "Late_delivery_risk", "Delivery Status", "Days for shipping (real)"
-    ], inplace=True, errors='ignore')
-
-    # Convert shipping dates to datetime and extract parts
-    df['DateOrders'] = pd.to_datetime(df['shipping date (DateOrders)'], errors='coerce')
-    df['ShippingYear'] = df['DateOrders'].dt.year
-    df['ShippingMonth'] = df['DateOrders'].dt.month
-    df['ShippingDay'] = df['DateOrders'].dt.day
-    df['ShippingHour'] = df['DateOrders'].dt.hour
-    df['ShippingWeekday'] = df['DateOrders'].dt.weekday
-    df.drop(columns=['shipping date (DateOrders)', 'DateOrders'], inplace=True)
-
-    # Convert order dates to datetime and extract parts
-    df['order date (DateOrders)'] = pd.to_datetime(df['order date (DateOrders)'], errors='coerce')
-    df['OrderYear'] = df['order date (DateOrders)'].dt.year
-    df['OrderMonth'] = df['order date (DateOrders)'].dt.month
-    df['OrderDay'] = df['order date (DateOrders)'].dt.day
-    df['OrderHour'] = df['order date (DateOrders)'].dt.hour
-    df['OrderWeekday'] = df['order date (DateOrders)'].dt.weekday
-    df.drop(columns=['order date (DateOrders)'], inplace=True)
-
-    print("Columns before encoding")
-    print(len(df.columns))
-    print(df.columns)
-
-    obj_cols = df.select_dtypes(include='object').columns
-    encoder = joblib.load(encoder_path)
-    obj_encoded = encoder.transform(df[obj_cols])
-    obj_encoded_df = pd.DataFrame(obj_encoded, columns=encoder.get_feature_names_out(obj_cols), index=df.index)
-
-    # Drop original object columns and concatenate encoded ones
-    df.drop(columns=obj_cols, inplace=True)
-    df_final = pd.concat([df.reset_index(drop=True), obj_encoded_df.reset_index(drop=True)], axis=1)
+    if encoder is None:
+        encoder = joblib.load(encoder_path)
+    preprocessor = OrderPreprocessor(encoder, feature_names)
+    if feature_names is None:
+        preprocessor.fit(df)
+    df_final = preprocessor.transform(df)
 
     # Final overview
-    print(f"Final shape: {df_final.shape}")
+    if verbose:
+        print(f"Final shape: {df_final.shape}")
+
+    return df_final
+
+def preprocess_csv_in_chunks(csv_path, output_path, preprocessor, chunksize=50_000, preview_columns=None):
+    """
+    Streams an uploaded CSV through an OrderPreprocessor in row chunks and
+    appends each processed chunk to output_path, so memory stays bounded
+    by the chunk size rather than the file size. Feature columns are
+    stored as float32.
+
+    The output is written to a temporary file and moved into place only
+    once every chunk succeeded.
+
+    Args:
+        csv_path (str): The uploaded CSV.
+        output_path (str): Where the processed frame is written; the
+            extension (.parquet or .csv) picks the format.
+        preprocessor (OrderPreprocessor): Preprocessor with a feature schema.
+        chunksize (int): Rows per chunk.
+        preview_columns (list, optional): Columns of the first chunk to
+            return as a preview.
+
+    Returns:
+        tuple: (preview DataFrame of the first chunk or None, total rows)
+    """
+    preview = None
+    # 以固定的 dtype 讀取，各批次欄位型別一致，類別欄位也不會被推斷成數值
+    with FrameWriter(output_path) as writer, read_upload(csv_path, chunksize=chunksize) as reader:
+        for chunk in metrics.timed('csv_parse', reader):
+            if preview is None and preview_columns is not None:
+                preview = chunk[preview_columns].copy()
+            writer.write(downcast(preprocessor.transform(chunk)))
 
-    return df_final
\ No newline at end of file
+    print(f"Preprocessed {writer.rows} rows from '{csv_path}' in chunks of {chunksize}")
+    return preview, writer.rows
@@ -0,0 +1,176 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.metrics import metrics
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+PARQUET = 'parquet'
+CSV = 'csv'
+
+# Parquet when pyarrow is installed; otherwise everything stays CSV
+DEFAULT_FORMAT = PARQUET if pq is not None else CSV
+READABLE_FORMATS = (PARQUET, CSV) if pq is not None else (CSV,)
+
+# Arrow IPC media types accepted and returned by the in-memory scoring API
+ARROW_STREAM = 'application/vnd.apache.arrow.stream'
+ARROW_FILE = 'application/vnd.apache.arrow.file'
+
+
+def frame_path(directory, stem, fmt=DEFAULT_FORMAT):
+    return os.path.join(directory, f"{stem}.{fmt}")
+
+
+def find_frame(directory, stem):
+    """
+    Path of the most recently written copy of a stored frame in any
+    readable format, or None if there is none. Older CSV outputs stay
+    readable next to newer Parquet ones.
+    """
+    paths = [frame_path(directory, stem, fmt) for fmt in READABLE_FORMATS]
+    paths = [path for path in paths if os.path.exists(path)]
+    return max(paths, key=os.path.getmtime, default=None)
+
+
+def frame_format(path):
+    return PARQUET if path.endswith(f'.{PARQUET}') else CSV
+
+
+def downcast(df):
+    """
+    Narrows numeric columns for storage: float64 becomes float32 and int64
+    becomes int32 when the values fit. Columns that are already narrower
+    (int8/int16 date parts, float32 features) are left alone.
+    """
+    int32 = np.iinfo(np.int32)
+    dtypes = {}
+    for column in df.columns:
+        values = df[column]
+        if values.dtype == np.float64:
+            dtypes[column] = np.float32
+        elif values.dtype == np.int64 and (values.empty or (values.min() >= int32.min and values.max() <= int32.max)):
+            dtypes[column] = np.int32
+    return df.astype(dtypes) if dtypes else df
+
+
+def read_frame(path, columns=None):
+    """Reads a stored frame, loading only ``columns`` when given."""
+    if frame_format(path) == PARQUET:
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+
+def frame_columns(path):
+    """Column names of a stored frame without reading its data."""
+    if frame_format(path) == PARQUET:
+        return pq.read_schema(path).names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def read_arrow(data):
+    """
+    DataFrame from Arrow IPC bytes in either the stream or the file format.
+    Raises ValueError on malformed data and RuntimeError without pyarrow.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required for Arrow input")
+    try:
+        table = pa.ipc.open_stream(data).read_all()
+    except pa.ArrowInvalid:
+        try:
+            table = pa.ipc.open_file(pa.BufferReader(data)).read_all()
+        except pa.ArrowException as e:
+            raise ValueError(f"Invalid Arrow data: {e}") from e
+    return table.to_pandas()
+
+
+def arrow_bytes(df):
+    """Arrow IPC stream bytes of a frame."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def write_frame(df, path):
+    """Writes a whole frame in the format given by the path's extension."""
+    with FrameWriter(path) as writer:
+        writer.write(df)
+    return path
+
+
+def iter_csv(path, batch_rows=50_000):
+    """Yields a stored frame as CSV text, one batch of rows at a time."""
+    if frame_format(path) == PARQUET:
+        batches = (batch.to_pandas() for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows))
+    else:
+        batches = pd.read_csv(path, chunksize=batch_rows)
+    header = True
+    for batch in batches:
+        yield batch.to_csv(index=False, header=header)
+        header = False
+
+
+class FrameWriter:
+    """
+    Appends DataFrame chunks to one stored frame. Data goes to a temporary
+    file that replaces ``path`` only when the writer closes without error,
+    so readers never see a half-written frame.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.format = frame_format(path)
+        self.writer = None
+        self.rows = 0
+
+    def write(self, df):
+        with metrics.stage('frame_write', rows=len(df)):
+            self._write(df)
+        self.rows += len(df)
+
+    def _write(self, df):
+        if self.format == PARQUET:
+            table = pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata(None)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.tmp_path, table.schema)
+            else:
+                # 後續批次沿用第一批的欄位型別
+                table = table.cast(self.writer.schema)
+            self.writer.write_table(table)
+        else:
+            df.to_csv(self.tmp_path, mode='w' if self.rows == 0 else 'a', header=self.rows == 0, index=False)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        if not os.path.exists(self.tmp_path):
+            raise pd.errors.EmptyDataError("No rows were written")
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            try:
+                self.close()
+            except Exception:
+                self.abort()
+                raise
+        else:
+            self.abort()
@@ -1,5 +1,6 @@
 // best_delivery_arrangement.tsx
-import React, { useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
+import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from "recharts";
 
 type OptimizeResult = {
   summary: any;
@@ -8,31 +9,85 @@ type OptimizeResult = {
   table: any[];
 };
 
+type JobStatus = {
+  job_id: string;
+  status: "queued" | "running" | "done" | "cancelled" | "failed";
+  bestScore: number | null;
+  scoreHistory: number[];
+  historyLength: number;
+  result?: OptimizeResult;
+  error?: string;
+};
+
+const API = "http://localhost:5001";
+const POLL_INTERVAL_MS = 500;
+
 export default function BestDeliveryArrangement() {
   const [method, setMethod] = useState<"tabu" | "ga">("tabu");
+  const [fileName, setFileName] = useState("example");
 
   const [loading, setLoading] = useState(false);
   const [result, setResult] = useState<OptimizeResult | null>(null);
+  const [jobId, setJobId] = useState<string | null>(null);
+  const [history, setHistory] = useState<number[]>([]);
+  const pollTimer = useRef<number | null>(null);
+
+  const stopPolling = () => {
+    if (pollTimer.current !== null) {
+      window.clearTimeout(pollTimer.current);
+      pollTimer.current = null;
+    }
+  };
+
+  useEffect(() => stopPolling, []);
+
+  // 只拿新的歷程資料 (since=目前長度)，逐步畫出收斂曲線
+  const poll = async (id: string, since: number) => {
+    try {
+      const job: JobStatus = await fetch(`${API}/optimize_jobs/${id}?since=${since}`).then((r) => r.json());
+      setHistory((prev) => [...prev, ...job.scoreHistory]);
+      if (job.status === "queued" || job.status === "running") {
+        pollTimer.current = window.setTimeout(() => poll(id, job.historyLength), POLL_INTERVAL_MS);
+        return;
+      }
+      if (job.result) setResult(job.result);
+      if (job.error) console.error("Optimization failed", job.error);
+      setJobId(null);
+      setLoading(false);
+    } catch (error) {
+      console.error("Failed to poll optimization job", error);
+      setJobId(null);
+      setLoading(false);
+    }
+  };
 
   const handleRun = async () => {
+    stopPolling();
     setLoading(true);
+    setResult(null);
+    setHistory([]);
     try {
       const endpoint = method === "tabu"
-        ? "http://localhost:5001/tabu_optimize"
-        : "http://localhost:5001/ga_optimize";
+        ? `${API}/tabu_optimize`
+        : `${API}/ga_optimize`;
       const res = await fetch(endpoint, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ async: true, file_name: fileName }),
       }).then((r) => r.json());
-      setResult(res);
-      console.log("Response result:", result);
+      setJobId(res.job_id);
+      poll(res.job_id, 0);
     } catch (error) {
       console.error("Failed to optimize", error);
-    } finally {
       setLoading(false);
     }
   };
 
+  const handleCancel = async () => {
+    if (!jobId) return;
+    await fetch(`${API}/optimize_jobs/${jobId}`, { method: "DELETE" });
+  };
+
   return (
     <div className="min-h-screen bg-gradient-to-br from-indigo-100 via-white to-gray-100 flex items-center justify-center p-6">
       <div className="bg-white/30 backdrop-blur-xl border border-white/40 rounded-2xl shadow-lg max-w-xl w-full p-8 text-gray-900">
@@ -62,6 +117,16 @@ export default function BestDeliveryArrangement() {
           </button>
         </div>
 
+        <div className="flex justify-center items-center gap-2 mb-6">
+          <label htmlFor="file-name" className="text-gray-700">Uploaded file</label>
+          <input
+            id="file-name"
+            value={fileName}
+            onChange={(e) => setFileName(e.target.value)}
+            className="px-3 py-1 rounded-lg border bg-white/60"
+          />
+        </div>
+
         <div className="text-center mb-4">
           <button
             onClick={handleRun}
@@ -70,8 +135,30 @@ export default function BestDeliveryArrangement() {
           >
             {loading ? "Running..." : "Run Optimization"}
           </button>
+          {jobId && (
+            <button
+              onClick={handleCancel}
+              className="ml-3 px-6 py-2 rounded-lg border bg-white/60 text-gray-800 hover:bg-white/80 transition"
+            >
+              Cancel
+            </button>
+          )}
         </div>
 
+        {history.length > 0 && (
+          <div className="h-48 mt-4">
+            <ResponsiveContainer width="100%" height="100%">
+              <LineChart data={history.map((score, i) => ({ iteration: i + 1, score }))}>
+                <CartesianGrid strokeDasharray="3 3" />
+                <XAxis dataKey="iteration" />
+                <YAxis domain={["auto", "auto"]} />
+                <Tooltip />
+                <Line type="monotone" dataKey="score" stroke="#6366f1" dot={false} isAnimationActive={false} />
+              </LineChart>
+            </ResponsiveContainer>
+          </div>
+        )}
+
         {result && (
           <div className="mt-6 text-sm text-gray-800">
             <h3 className="font-semibold mb-2">Optimization Result</h3>